@@ -0,0 +1,271 @@
+"""
+Offline benchmark for every card route: python -m bench.run
+
+Starts the stub upstreams (bench/stubs.py), points the app at them, waits for
+every scheduled card's first fetch and then loads each route with concurrent
+requests, reporting p50 / p95 / p99 latency (ms) and requests per second as
+JSON. With --baseline it compares against an earlier run's JSON and exits 1
+if any route got slower or served fewer requests per second than the
+tolerance allows.
+
+    python -m bench.run --output bench_results.json
+    python -m bench.run --latency 0.2 --fail-rate 0.1 --baseline bench_results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import cards
+from bench.stubs import StubServer, FIXTURES
+
+# Env the cards read, pointing at hosts the stubs have fixtures for
+BENCH_ENV = {
+    'CARD_CACHE_PATH': "",
+    'OPENWEATHER_TOKEN': "bench",
+    'CITY': "Springfield",
+    'TRACK17_TOKEN': "bench",
+    'TRACK17_TRACKING': "BENCH0000000001US,BENCH0000000002US,BENCH0000000003US",
+    'MONDAY_TOKEN': "bench",
+    'MONDAY_BOARD_ID': "1234567890",
+    'MONDAY_WEBHOOK_TOKEN': "",
+    'STEAM_TOKEN': "bench",
+    'ICAL_URL': "https://calendar.example.com/basic.ics",
+    'NEWS_FEEDS': "https://feeds.feedburner.com/TheHackersNews",
+    'COUNTDOWN_DATE': "12/31/2099",
+    'SENSOR_DRIVERS': "simulated",
+}
+
+
+def percentile(values, p):
+    # Nearest rank on an already sorted list
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+def parse_hosts(specs):
+    """
+    --host api.steampowered.com=latency:0.5,fail_rate:0.2 -> {'api.steampowered.com': {...}}
+    """
+    hosts = {}
+    for spec in specs or []:
+        host, _, settings = spec.partition("=")
+        hosts[host] = {key: float(value) for key, value in (item.split(":") for item in settings.split(",") if item)}
+    return hosts
+
+
+def load_app(stub_url, cards):
+    """
+    Imports the app with the bench env and every upstream sent to the stubs.
+    """
+    env = dict(BENCH_ENV)
+    with open(os.path.join(FIXTURES, "steam_ids.txt")) as f:
+        env['STEAM_IDS'] = f.read().strip()
+    env['CARDS'] = cards
+    os.environ.update(env)
+
+    from http_client import http
+    http.redirect = stub_url
+
+    # The Monday SDK sends its own requests, point its endpoint at the stub too
+    try:
+        import monday_sdk.graphql_handler
+        monday_sdk.graphql_handler.API_URL = f"{stub_url}/api.monday.com/v2"
+    except ImportError:
+        pass
+
+    import app
+    return app
+
+
+def seed_speedtest(app, hours=48):
+    """
+    Fills the network store and the probe's latest result with made up
+    samples, speedtest.net can't be stubbed so the probe itself never runs.
+    """
+    if app.network_store is None:
+        return
+
+    now = time.time()
+    result = None
+    for i in range(hours * 2):
+        result = {'ping': 12 + i % 7, 'download': 300 + (i * 37) % 90, 'upload': 40 + (i * 13) % 20,
+                  'measured_at': now - (hours * 2 - i) * 1800}
+        app.network_store.append(result)
+    app.scheduler.cache.set('speedtest', result, 7200)
+
+
+def warm_up(app, timeout):
+    """
+    Waits for every scheduled card's first fetch, returns (seconds taken, cards still missing).
+    """
+    start = time.monotonic()
+    pending = set(app.scheduler.jobs)
+    while pending and time.monotonic() - start < timeout:
+        pending = {name for name in pending if app.scheduler.get_entry(name) is None}
+        time.sleep(0.05)
+    return time.monotonic() - start, sorted(pending)
+
+
+def serve(app):
+    from werkzeug.serving import make_server
+
+    # One access log line per request would swamp the results
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def load_route(base_url, path, count, concurrency, conditional):
+    """
+    Sends count GETs to path over `concurrency` keep-alive sessions.
+    """
+    local = threading.local()
+    etags = {}
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+
+        headers = {}
+        if conditional and 'etag' in etags:
+            headers['If-None-Match'] = etags['etag']
+
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path, headers=headers, timeout=30)
+            elapsed = time.perf_counter() - start
+            ok = response.status_code in (200, 304)
+            if response.headers.get('ETag'):
+                etags['etag'] = response.headers['ETag']
+            return elapsed, ok, response.status_code == 304
+        except requests.RequestException:
+            return time.perf_counter() - start, False, False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed * 1000 for elapsed, ok, _ in results if ok)
+    return {'requests': count,
+            'errors': sum(1 for _, ok, _ in results if not ok),
+            'not_modified': sum(1 for _, _, cached in results if cached),
+            'rps': round(count / wall, 1),
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50': round(percentile(latencies, 50), 3) if latencies else None,
+            'p95': round(percentile(latencies, 95), 3) if latencies else None,
+            'p99': round(percentile(latencies, 99), 3) if latencies else None}
+
+
+def compare(results, baseline, tolerance, floor_ms=1.0):
+    """
+    Lists regressions against a baseline run: a route whose p95 / p99 grew by
+    more than tolerance (and floor_ms, so sub millisecond noise is ignored)
+    or whose requests per second dropped by more than tolerance.
+    """
+    regressions = []
+    for path, now in results['routes'].items():
+        before = baseline.get('routes', {}).get(path)
+        if not before:
+            continue
+
+        for key in ('p95', 'p99'):
+            if now[key] is not None and before[key] is not None:
+                if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] > floor_ms:
+                    regressions.append(f"{path} {key} {before[key]:.2f}ms -> {now[key]:.2f}ms")
+        if now['rps'] < before['rps'] * (1 - tolerance):
+            regressions.append(f"{path} rps {before['rps']} -> {now['rps']}")
+        if now['errors'] > before['errors']:
+            regressions.append(f"{path} errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of every card route against stub upstreams.")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--routes", help="comma separated paths, default every card route plus / and /get-dashboard")
+    parser.add_argument("--cards", default=",".join(cards.AVAILABLE), help="CARDS to enable, default all of them")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every stub call waits")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds on top of --latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of stub calls answered with a 503")
+    parser.add_argument("--host", action="append", help="per upstream override, e.g. api.steampowered.com=latency:0.5,fail_rate:0.2")
+    parser.add_argument("--conditional", action="store_true", help="send If-None-Match like a polling browser")
+    parser.add_argument("--warmup-timeout", type=float, default=60)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before it counts as a regression")
+    args = parser.parse_args(argv)
+
+    stub = StubServer(latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate, hosts=parse_hosts(args.host))
+    stub_url = stub.start()
+
+    output_path = args.output and os.path.abspath(args.output)
+    baseline_path = args.baseline and os.path.abspath(args.baseline)
+
+    # Every store the app writes (network.db, news.db, note.txt, ...) goes in a throwaway directory
+    workdir = tempfile.mkdtemp(prefix="dashboard-bench-")
+    os.chdir(workdir)
+
+    app = load_app(stub_url, args.cards)
+    seed_speedtest(app)
+    app.start_background(speedtest=False)
+    warmup, cold = warm_up(app, args.warmup_timeout)
+
+    server, base_url = serve(app)
+    paths = args.routes.split(",") if args.routes else ["/", "/get-dashboard"] + [path for _, path, _ in app.DASHBOARD_CARDS]
+
+    routes = {}
+    for path in paths:
+        routes[path] = load_route(base_url, path, args.requests, args.concurrency, args.conditional)
+        print(f"{path:<26} p50 {routes[path]['p50']}ms  p95 {routes[path]['p95']}ms  "
+              f"p99 {routes[path]['p99']}ms  {routes[path]['rps']} req/s", file=sys.stderr)
+    server.shutdown()
+
+    results = {
+        'meta': {'python': platform.python_version(),
+                 'platform': platform.platform(),
+                 'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 'requests': args.requests,
+                 'concurrency': args.concurrency,
+                 'conditional': args.conditional,
+                 'latency': args.latency,
+                 'jitter': args.jitter,
+                 'fail_rate': args.fail_rate,
+                 'hosts': parse_hosts(args.host)},
+        'warmup': {'seconds': round(warmup, 3), 'cold_cards': cold},
+        'upstream': {'calls': dict(stub.calls), 'failures': dict(stub.failures), 'missing': dict(stub.missing)},
+        'routes': routes,
+    }
+    stub.stop()
+
+    output = json.dumps(results, indent=2)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
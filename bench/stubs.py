@@ -0,0 +1,106 @@
+"""
+Local stand-ins for every upstream the cards call. http_client.http.redirect
+sends each call to the stub as /<host>/<path>, which answers from the file at
+fixtures/<host>/<path> (any extension), after an optional delay and with an
+optional share of 503s so retries and stale cards can be measured too.
+"""
+import glob
+import mimetypes
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class StubServer:
+    """
+    latency / jitter are seconds, fail_rate the fraction of calls answered
+    with a 503. hosts overrides them per upstream, e.g.
+    {'api.steampowered.com': {'latency': 0.5, 'fail_rate': 0.2}}.
+    """
+    def __init__(self, fixtures=FIXTURES, latency=0, jitter=0, fail_rate=0, hosts=None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.hosts = hosts or {}
+        self.calls = Counter()
+        self.failures = Counter()
+        self.missing = Counter()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _setting(self, host, name):
+        return self.hosts.get(host, {}).get(name, getattr(self, name))
+
+    def find(self, host, path):
+        """
+        Fixture file for a call, or None.
+        """
+        base = os.path.join(self.fixtures, host, *[part for part in path.split("/") if part])
+        if os.path.isfile(base):
+            return base
+        matches = sorted(glob.glob(glob.escape(base) + ".*"))
+        return matches[0] if matches else None
+
+    def respond(self, handler):
+        host, _, path = handler.path.lstrip("/").partition("/")
+        path = "/" + path.split("?", 1)[0]
+        self.calls[host] += 1
+
+        delay = self._setting(host, 'latency') + random.uniform(0, self._setting(host, 'jitter'))
+        if delay:
+            time.sleep(delay)
+
+        if random.random() < self._setting(host, 'fail_rate'):
+            self.failures[host] += 1
+            return 503, "text/plain", b"injected failure"
+
+        fixture = self.find(host, path)
+        if fixture is None:
+            self.missing[f"{host}{path}"] += 1
+            return 404, "text/plain", b"no fixture"
+
+        with open(fixture, "rb") as f:
+            body = f.read()
+        return 200, mimetypes.guess_type(fixture)[0] or "application/octet-stream", body
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _answer(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                status, content_type, body = stub.respond(self)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _answer
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="bench-stubs", daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,128 @@
+import hashlib
+from datetime import date, datetime, timedelta
+
+from icalevents.icalevents import events
+
+from http_client import http
+
+
+def _local(dt):
+    # icalevents hands back aware datetimes for timed events, keep naive ones as they are
+    return dt.astimezone() if isinstance(dt, datetime) and dt.tzinfo else dt
+
+
+def _day_of(dt):
+    return dt.date() if isinstance(dt, datetime) else dt
+
+
+class CalendarSync:
+    """
+    Keeps an iCal feed's expanded events in memory, indexed by day.
+    The feed is fetched with ETag / Last-Modified so an unchanged feed costs a
+    304, and recurrences are only expanded again when the content actually
+    changed or the expansion window needs to move forward (about once a week).
+    """
+    def __init__(self, url, days=30, slack=7):
+        # Google / iCloud share links are webcal://, which is just https to requests
+        if url and url.lower().startswith("webcal://"):
+            url = "https://" + url[len("webcal://"):]
+        self.url = url
+        self.days = days
+        self.slack = slack
+        self.etag = None
+        self.last_modified = None
+        self.content = None
+        self.content_hash = None
+        self.window = None
+        self.version = 0
+        self.by_day = {}
+
+    def sync(self):
+        """
+        Checks the feed for changes and rebuilds the index if needed.
+        Returns True if the index was rebuilt.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        response = http.get('ical', self.url, headers=headers)
+        changed = False
+        if response.status_code != 304:
+            response.raise_for_status()
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+
+            # Some servers ignore conditional requests, so compare the body as well
+            content_hash = hashlib.sha256(response.content).hexdigest()
+            if content_hash != self.content_hash:
+                self.content = response.content
+                self.content_hash = content_hash
+                changed = True
+
+        today = date.today()
+        # The window starts at the first of the month so the month grid is fully covered
+        window_ok = self.window and self.window[0] == today.replace(day=1) and self.window[1] >= today + timedelta(days=self.days)
+        if not changed and window_ok:
+            return False
+
+        self._rebuild(today)
+        return True
+
+    def _rebuild(self, today):
+        start = today.replace(day=1)
+        end = today + timedelta(days=self.days + self.slack)
+        expanded = events(string_content=self.content,
+                          start=datetime.combine(start, datetime.min.time()),
+                          end=datetime.combine(end, datetime.min.time()))
+        expanded.sort(key=lambda e: _local(e.start))
+
+        by_day = {}
+        for event in expanded:
+            first = _day_of(_local(event.start))
+            last = _day_of(_local(event.end)) if event.end else first
+            # All day events end at midnight of the following day
+            if event.all_day and last > first:
+                last -= timedelta(days=1)
+
+            day = max(first, start)
+            while day <= min(last, end):
+                by_day.setdefault(day, []).append(event)
+                day += timedelta(days=1)
+
+        # Swap in the new index in one go so readers never see a half built one
+        self.by_day = by_day
+        self.window = (start, end)
+        self.version += 1
+
+    def event_days(self):
+        return self.by_day.keys()
+
+    def upcoming(self, limit=8, now=None):
+        """
+        Returns the next `limit` events that haven't finished yet, in start order.
+        """
+        now = now or datetime.now().astimezone()
+        by_day = self.by_day
+        found = []
+        seen = set()
+        day = now.date()
+        last_day = self.window[1] if self.window else day
+        while day <= last_day and len(found) < limit:
+            for event in by_day.get(day, []):
+                end = _local(event.end or event.start)
+                if isinstance(end, datetime) and end.tzinfo is None:
+                    end = end.astimezone()
+                elif not isinstance(end, datetime):
+                    end = datetime.combine(end, datetime.min.time()).astimezone()
+
+                if id(event) not in seen and end >= now:
+                    seen.add(id(event))
+                    found.append(event)
+                    if len(found) == limit:
+                        break
+            day += timedelta(days=1)
+
+        return found
@@ -0,0 +1,123 @@
+"""
+Card plugins. Each module in this package describes one dashboard card with a
+Card (its route, template, refresh interval and the packages it needs), and
+only the cards enabled in CARDS are imported, so a dashboard only pays the
+import time and memory of the cards it shows. Card modules import their heavy
+packages inside functions, the first time they're actually used.
+"""
+import importlib
+import importlib.util
+import threading
+from functools import wraps
+
+# Every card, in dashboard order
+AVAILABLE = ['weather', 'shipping', 'calendar', 'calendar_events', 'tasks', 'canvas', 'countdown',
+             'sticky_note', 'steam', 'system', 'network_graph', 'sensors', 'news', 'clock', 'simulation']
+
+# Cards on when CARDS isn't set (the simulation shares its spot with the sticky note)
+DEFAULT = [name for name in AVAILABLE if name != 'simulation']
+
+
+class Card:
+    """
+    A card's route and how it gets its data. Hooks all take the Dashboard:
+    - fetch(dash) returns the template context, run by the scheduler every
+      `interval` seconds so the route only renders the last good data
+    - view(dash) renders the card itself (local data), re-rendered only when
+      fingerprint(dash) changes
+    - setup(dash) adds anything else (webhooks, watchers, subscriptions)
+    - start(dash) starts the card's background threads
+    requires lists the packages the card can't run without, services the
+    shared services it uses ('probe' for the speedtest probe) and upstreams
+    the providers with a daily quota it calls (see http_client.DAILY_QUOTAS),
+    so its refreshes slow down as their quotas run low.
+    """
+    def __init__(self, name, title, route, template=None, fetch=None, interval=None,
+                 view=None, fingerprint=None, setup=None, start=None,
+                 section=None, timeout=2, poll=None, pushes=(), requires=(), services=(), upstreams=()):
+        self.name = name
+        self.title = title
+        self.route = route
+        self.template = template
+        self.fetch = fetch
+        self.interval = interval
+        self.view = view
+        self.fingerprint = fingerprint
+        self.setup = setup
+        self.start = start
+        # Ids in index.html / style.css
+        self.section = section or name.replace('_', '-')
+        self.element_id = f"{self.section}-card"
+        # How long /get-dashboard waits for it, and how often the browser re-polls it (seconds, None to only push)
+        self.timeout = timeout
+        self.poll = poll
+        # Other dashboard cards to push when this one refreshes
+        self.pushes = list(pushes)
+        self.requires = list(requires)
+        self.services = list(services)
+        self.upstreams = list(upstreams)
+
+
+class Dashboard:
+    """
+    What card hooks get handed: the Flask app, the shared services and the enabled cards.
+    """
+    def __init__(self, app, scheduler, bus, watcher, probe, network_store, cards, external_routes, push_card):
+        self.app = app
+        self.scheduler = scheduler
+        self.bus = bus
+        self.watcher = watcher
+        self.probe = probe
+        self.network_store = network_store
+        self.cards = cards
+        self.enabled = {card.name for card in cards}
+        self.external_routes = external_routes
+        self.push_card = push_card
+
+    def allow_external(self, path):
+        self.external_routes.append(path)
+
+
+def lazy(factory):
+    """
+    Decorator: the factory runs on the first call only, every later call
+    returns the same object. Used for each card's store / client so its
+    packages are only imported once the card needs them.
+    """
+    lock = threading.Lock()
+    built = []
+
+    @wraps(factory)
+    def get(*args):
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory(*args))
+        return built[0]
+    return get
+
+
+def load(names=None):
+    """
+    Imports the cards in names (comma separated, DEFAULT if empty) and returns
+    their Cards in dashboard order. Unknown names and cards missing a required
+    package are printed and skipped.
+    """
+    wanted = [name.strip() for name in names.split(',') if name.strip()] if names else DEFAULT
+    for name in wanted:
+        if name not in AVAILABLE:
+            print(f"Card Error ({name}): no such card")
+
+    cards = []
+    for name in AVAILABLE:
+        if name not in wanted:
+            continue
+
+        card = importlib.import_module(f"cards.{name}").card
+        missing = [package for package in card.requires if importlib.util.find_spec(package) is None]
+        if missing:
+            print(f"Card Error ({name}): missing {', '.join(missing)}")
+            continue
+        cards.append(card)
+
+    return cards
@@ -0,0 +1,35 @@
+"""
+Month grid that highlights today and the days with events.
+"""
+from datetime import date
+
+from flask import render_template
+
+import helper
+from cards import Card
+from cards.calendar_events import calendar_sync
+
+
+def view(dash):
+    cal = helper.get_calendar_data(calendar_sync().event_days())
+
+    return render_template('partials/calendar_card.html',
+                           month_name=cal['month_name'],
+                           year=cal['year'],
+                           calendar_weeks=cal['calendar_weeks'])
+
+
+def fingerprint(dash):
+    return (date.today(), calendar_sync().version)
+
+
+def setup(dash):
+    dash.watcher.on_new_day(lambda: dash.push_card('calendar-card'))
+
+    # Normally the agenda keeps the feed synced, without it the grid syncs it itself
+    if 'calendar_events' not in dash.enabled:
+        dash.scheduler.register('calendar', lambda: calendar_sync().sync(), 900)
+
+
+card = Card('calendar', "Calendar", '/calendar', view=view, fingerprint=fingerprint, setup=setup,
+            requires=['icalevents'])
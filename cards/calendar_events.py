@@ -0,0 +1,42 @@
+"""
+Upcoming events from an iCal feed.
+"""
+import calendar
+from datetime import datetime
+from os import getenv
+
+from cards import Card, lazy
+
+ICAL_URL = getenv("ICAL_URL")
+
+
+@lazy
+def calendar_sync():
+    from calendar_sync import CalendarSync
+
+    # Expanded iCal events indexed by day, shared by the agenda and the month grid
+    return CalendarSync(ICAL_URL, days=30)
+
+
+def fetch(dash):
+    now = datetime.now()
+    month_name = now.strftime("%B %Y")
+
+    # Only re-downloads and re-expands the feed when it actually changed
+    calendar_sync().sync()
+
+    # Get the month grid (same logic as before)
+    month_days = calendar.monthcalendar(now.year, now.month)
+    return {'days': month_days,
+            'month_name': month_name,
+            'date_today': now.day,
+            'events': calendar_sync().upcoming(limit=8)} # Show top 8 events
+
+
+def setup(dash):
+    # The agenda's date comes from its fetch, so refresh it (which pushes it when done)
+    dash.watcher.on_new_day(lambda: dash.scheduler.refresh('calendar_events', force=True))
+
+
+card = Card('calendar_events', "Agenda", '/get-calendar-events', 'partials/calendar_events_card.html',
+            fetch=fetch, interval=900, setup=setup, pushes=['calendar-card'], requires=['icalevents'])
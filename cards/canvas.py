@@ -0,0 +1,34 @@
+"""
+Upcoming Canvas assignments across every class.
+"""
+from cards import Card
+
+
+def fetch(dash):
+    from http_client import http
+
+    # Replace with YOUR school's canvas URL (e.g. canvas.instructure.com, canvas.vt.edu, etc.)
+    base_url = "https://canvas.instructure.com"
+    token = "YOUR_ACCESS_TOKEN_HERE"
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    # "Self upcoming events" grabs assignments across ALL your classes
+    url = f"{base_url}/api/v1/users/self/upcoming_events"
+    
+    tasks = []
+    resp = http.get_json('canvas', url, headers=headers)
+    
+    # Canvas returns a list of dictionaries
+    for item in resp[:4]: # Limit to top 4
+        tasks.append({
+            "title": item.get('title'),
+            "class": item.get('context_name', 'Class'), # "History 101"
+            "due": item.get('start_at', '')[:10] # Grab just the YYYY-MM-DD date part
+        })
+
+    return {'tasks': tasks}
+
+
+card = Card('canvas', "Canvas Tasks", '/get-canvas', 'partials/extended/canvas_card.html',
+            fetch=fetch, interval=300, requires=['requests'])
@@ -0,0 +1,13 @@
+"""
+Local time and date (ticks in the browser).
+"""
+from flask import render_template
+
+from cards import Card
+
+
+def view(dash):
+    return render_template('partials/clock_card.html')
+
+
+card = Card('clock', "Clock", '/get-clock', view=view, fingerprint=lambda dash: 'static')
@@ -0,0 +1,30 @@
+"""
+Days left until COUNTDOWN_DATE.
+"""
+from datetime import datetime, date
+from os import getenv
+
+from flask import render_template
+
+from cards import Card
+
+COUNTDOWN_DATE = getenv("COUNTDOWN_DATE")
+
+
+def view(dash):
+    target_date = datetime.strptime(COUNTDOWN_DATE, "%m/%d/%Y")
+    now = datetime.now()
+    delta = target_date - now
+    
+    return render_template('partials/countdown_card.html', days=delta.days, event="Graduation")
+
+
+def fingerprint(dash):
+    return date.today()
+
+
+def setup(dash):
+    dash.watcher.on_new_day(lambda: dash.push_card('countdown-card'))
+
+
+card = Card('countdown', "Countdown Timer", '/get-countdown', view=view, fingerprint=fingerprint, setup=setup)
@@ -0,0 +1,55 @@
+"""
+Speedtest history (ping, download and upload) from the network store.
+"""
+import time
+
+from flask import request, render_template, jsonify
+
+from cards import Card
+import metrics
+
+# Chart ranges offered on the card, in hours
+WINDOWS = {'1d': 24, '7d': 168, '30d': 720}
+
+# Roughly how many points per line the chart gets, whatever the range
+GRAPH_POINTS = 240
+
+
+def _hours():
+    # How far back to chart, e.g. /get-network-graph?hours=168 for a week
+    return request.args.get('hours', 24, type=int)
+
+
+def view(dash):
+    # Only the chart itself, its points come from /network-graph/series
+    return render_template('partials/extended/graph_card.html', hours=_hours(), windows=WINDOWS)
+
+
+def series(dash):
+    """
+    The chart's points as {'ping': [[ts, value], ...], 'download': ..., 'upload': ...,
+    'start', 'cursor'}. With ?since=<cursor from the last call> only the points
+    from there on come back, and the chart swaps out its own points from
+    `since` for these.
+    """
+    hours = _hours()
+    since = request.args.get('since', type=float)
+    start = time.time() - hours * 3600
+    # Each bucket keeps its low and high point
+    bucket = max(hours * 3600 * 2 // GRAPH_POINTS, 60)
+
+    try:
+        points, cursor = dash.network_store.series(max(start, since or 0), bucket)
+    except Exception as e:
+        metrics.error("Network Graph", e)
+        points, cursor = {}, None
+
+    return jsonify(start=start, cursor=cursor if cursor is not None else since, **points)
+
+
+def setup(dash):
+    dash.app.add_url_rule('/network-graph/series', 'network_graph_series', lambda: series(dash))
+
+
+card = Card('network_graph', "Network Graph", '/get-network-graph', view=view,
+            fingerprint=lambda dash: 'static', setup=setup, services=['probe'])
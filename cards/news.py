@@ -0,0 +1,25 @@
+"""
+Headlines from the feeds in NEWS_FEEDS.
+"""
+from os import getenv
+
+from cards import Card, lazy
+
+NEWS_FEEDS = getenv("NEWS_FEEDS")
+
+
+@lazy
+def news_store():
+    from news import NewsStore, parse_feeds
+
+    # Headlines from every configured feed, merged and deduped in news.db
+    return NewsStore(parse_feeds(NEWS_FEEDS), "news.db")
+
+
+def fetch(dash):
+    news_store().sync()
+    return {'articles': news_store().latest(5)}
+
+
+card = Card('news', "News", '/get-news', 'partials/extended/news_card.html',
+            fetch=fetch, interval=1800, requires=['feedparser'])
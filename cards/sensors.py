@@ -0,0 +1,34 @@
+"""
+Environment sensors read through the drivers in sensors.py.
+"""
+from os import getenv
+
+from flask import render_template
+
+from cards import Card, lazy
+
+SENSOR_DRIVERS = getenv("SENSOR_DRIVERS")
+
+
+@lazy
+def sensor_hub():
+    from sensors import SensorHub, load_drivers
+
+    # Each driver sampled on its own thread
+    return SensorHub(load_drivers(SENSOR_DRIVERS))
+
+
+def view(dash):
+    # Latest readings the driver threads stored, no I/O here
+    return render_template('partials/extended/sensor_card.html', sensors=sensor_hub().latest())
+
+
+def fingerprint(dash):
+    return sensor_hub().version
+
+
+def start(dash):
+    sensor_hub().start()
+
+
+card = Card('sensors', "Sensors", '/get-sensors', view=view, fingerprint=fingerprint, start=start, poll=10)
@@ -0,0 +1,50 @@
+"""
+Package tracking through 17TRACK, kept up to date by its webhook.
+"""
+from os import getenv
+
+from flask import request, abort
+
+from cards import Card, lazy
+
+TRACK17_TOKEN = getenv("TRACK17_TOKEN")
+TRACK17_TRACKING = getenv("TRACK17_TRACKING")
+
+
+@lazy
+def shipments():
+    from shipments import ShipmentStore
+
+    # Tracked packages and their latest 17TRACK info
+    return ShipmentStore(TRACK17_TOKEN, "shipments.db")
+
+
+def fetch(dash):
+    # Registers new numbers and only asks 17TRACK about packages still in transit
+    numbers = TRACK17_TRACKING.split(',') if TRACK17_TRACKING else []
+    shipments().sync(numbers)
+
+    return {'packages': shipments().active()}
+
+
+def setup(dash):
+    def track17_webhook():
+        """
+        Receives 17TRACK push updates (set the webhook URL in the 17TRACK dashboard).
+        Pushes are signed with TRACK17_TOKEN, without it they can't be checked so they're refused.
+        """
+        if not TRACK17_TOKEN or not shipments().verify_webhook(request.get_data(), request.headers.get('sign')):
+            abort(403)
+
+        if shipments().apply_webhook(request.get_json(silent=True) or {}):
+            # Nothing to poll for a package that just updated, this only re-reads the store
+            dash.scheduler.refresh('shipping', force=True)
+
+        return '', 200
+
+    dash.app.add_url_rule('/17track-webhook', 'track17_webhook', track17_webhook, methods=['POST'])
+    dash.allow_external('/17track-webhook')
+
+
+card = Card('shipping', "Tracking", '/get-shipping', 'partials/shipping_list_card.html',
+            fetch=fetch, interval=3600, setup=setup, requires=['requests'], upstreams=['17track'])
@@ -0,0 +1,39 @@
+"""
+Conway's Game of Life, stepped on the server (life.py) and streamed to the card.
+"""
+from os import getenv
+
+from flask import render_template, Response
+
+from cards import Card, lazy
+
+# Grid size in cells, e.g. 160x100
+SIMULATION_SIZE = getenv("SIMULATION_SIZE") or "160x100"
+
+
+@lazy
+def runner():
+    from life import LifeRunner
+
+    cols, rows = (int(n) for n in SIMULATION_SIZE.lower().split("x"))
+    return LifeRunner(cols, rows)
+
+
+def view(dash):
+    # The card only draws, every generation comes from /simulation-stream
+    return render_template('partials/extended/simulation_card.html')
+
+
+def setup(dash):
+    @dash.app.route('/simulation-stream')
+    def simulation_stream():
+        return Response(runner().stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def start(dash):
+    runner().start()
+
+
+card = Card('simulation', "Simulation", '/get-simulation', view=view, fingerprint=lambda dash: 'static',
+            setup=setup, start=start)
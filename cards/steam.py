@@ -0,0 +1,30 @@
+"""
+Steam friends and what they're playing.
+"""
+import os
+from os import getenv
+
+from cards import Card, lazy
+
+STEAM_TOKEN = getenv("STEAM_TOKEN")
+STEAM_IDS = getenv("STEAM_IDS")
+
+
+@lazy
+def steam_presence(dash):
+    from static_cache import StaticCache
+    from steam import SteamPresence, parse_ids
+
+    # Friends' presence, polled in chunks of 100 ids with their avatars served from static/
+    avatars = StaticCache(os.path.join(dash.app.static_folder, "avatars"), "/static/avatars",
+                          'steam-avatars', ".jpg", "Steam Avatar")
+    return SteamPresence(STEAM_TOKEN, parse_ids(STEAM_IDS), avatars)
+
+
+def fetch(dash):
+    steam_presence(dash).poll()
+    return {'friends': steam_presence(dash).friends()}
+
+
+card = Card('steam', "Steam Info", '/get-steam', 'partials/extended/steam_card.html',
+            fetch=fetch, interval=300, requires=['requests'], upstreams=['steam'])
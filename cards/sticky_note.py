@@ -0,0 +1,28 @@
+"""
+Shows whatever is in note.txt.
+"""
+from os.path import exists, getmtime
+
+from flask import render_template
+
+from cards import Card
+
+
+def view(dash):
+    content = "Edit note.txt to change this message."
+    if exists('note.txt'):
+        with open('note.txt', 'r') as f:
+            content = f.read()
+            
+    return render_template('partials/note_card.html', note=content)
+
+
+def fingerprint(dash):
+    return getmtime('note.txt') if exists('note.txt') else None
+
+
+def setup(dash):
+    dash.watcher.watch_file('note.txt', lambda: dash.push_card('sticky-note-card'))
+
+
+card = Card('sticky_note', "Note", '/get-sticky-note', view=view, fingerprint=fingerprint, setup=setup)
@@ -0,0 +1,70 @@
+"""
+CPU, memory, disks, network interfaces and the latest speedtest.
+"""
+from flask import render_template
+
+import helper
+from cards import Card, lazy
+
+
+@lazy
+def sampler():
+    from sysmon import SystemSampler
+
+    # CPU, memory, disks, interfaces and temperatures sampled in the background
+    return SystemSampler(interval=5, history=120)
+
+
+def view(dash):
+    sample = sampler().latest
+    if sample is None:
+        return render_template('partials/loading_card.html')
+
+    memory = sample['memory']
+
+    # Latest result from the background probe (0 until the first one finishes)
+    latest = dash.probe.latest
+    if latest:
+        upload = latest['upload']
+        download = latest['download']
+    else:
+        upload = 0.00
+        download = 0.00
+
+    disks = [dict(disk, history=helper.sparkline_points(sampler().history_of(f"disk:{disk['mountpoint']}"), top=100))
+             for disk in sample['disks']]
+    interfaces = [dict(nic,
+                       sent_label=helper.format_rate(nic['sent']),
+                       recv_label=helper.format_rate(nic['recv']),
+                       history=helper.sparkline_points(sampler().history_of(f"recv:{nic['name']}")))
+                  for nic in sample['interfaces']]
+
+    return render_template('partials/system_card.html',
+                           cpu_percent=sample['cpu'],
+                           cpu_history=helper.sparkline_points(sampler().history_of('cpu'), top=100),
+                           ram_used=f"{(memory.used/1024**3):.2f}",
+                           ram_total=f"{(memory.total/1024**3):.2f}",
+                           ram_percent=memory.percent,
+                           ram_history=helper.sparkline_points(sampler().history_of('memory'), top=100),
+                           disks=disks,
+                           interfaces=interfaces,
+                           temperatures=sample['temperatures'],
+                           net_upload_speed=f"{upload:.2f}",
+                           net_download_speed=f"{download:.2f}",
+                           ipaddr=sample['ipaddr'])
+
+
+def fingerprint(dash):
+    return (sampler().version, (dash.probe.latest or {}).get('measured_at'))
+
+
+def setup(dash):
+    dash.probe.subscribe(lambda result: dash.push_card('sysinfo-card'))
+
+
+def start(dash):
+    sampler().start()
+
+
+card = Card('system', "System", '/get-system', view=view, fingerprint=fingerprint, setup=setup, start=start,
+            section='sysinfo', timeout=3, poll=15, requires=['psutil'], services=['probe'])
@@ -0,0 +1,61 @@
+"""
+Tasks from a Monday board, kept up to date by its webhook.
+"""
+from os import getenv
+
+from flask import request, abort, jsonify
+
+from cards import Card, lazy
+
+MONDAY_TOKEN = getenv("MONDAY_TOKEN")
+MONDAY_BOARD_ID = getenv("MONDAY_BOARD_ID")
+MONDAY_WEBHOOK_TOKEN = getenv("MONDAY_WEBHOOK_TOKEN")
+
+
+@lazy
+def task_store():
+    from monday_sdk import MondayClient
+    from task_store import TaskStore
+
+    # Made once and reused (the SDK sends its own requests, so it can't share the pooled session).
+    # Webhook changes go through tasks.db so every worker's store sees them
+    return TaskStore(MondayClient(token=MONDAY_TOKEN), MONDAY_BOARD_ID, "tasks.db")
+
+
+def fetch(dash):
+    from http_client import http
+
+    # The SDK's calls don't go through http, count the sync against Monday's quota here
+    http.spend('monday')
+    # Only pulls items changed since the last sync (or flagged by the webhook)
+    task_store().sync()
+    return {'tasks': task_store().sorted_tasks()}
+
+
+def setup(dash):
+    def monday_webhook():
+        """
+        Receives Monday board webhooks (point them at /monday-webhook?token=MONDAY_WEBHOOK_TOKEN)
+        and refreshes the tasks card with just the changed items. Without a
+        MONDAY_WEBHOOK_TOKEN set it's turned off, since anyone could post to it.
+        """
+        if not MONDAY_WEBHOOK_TOKEN or request.args.get('token') != MONDAY_WEBHOOK_TOKEN:
+            abort(403)
+
+        payload = request.get_json(silent=True) or {}
+
+        # Monday checks the URL by sending a challenge it expects back when the webhook is created
+        if 'challenge' in payload:
+            return jsonify(challenge=payload['challenge'])
+
+        if task_store().apply_webhook(payload.get('event', {})):
+            dash.scheduler.refresh('tasks', force=True)
+
+        return '', 200
+
+    dash.app.add_url_rule('/monday-webhook', 'monday_webhook', monday_webhook, methods=['POST'])
+    dash.allow_external('/monday-webhook')
+
+
+card = Card('tasks', "Tasks", '/get-tasks', '/partials/tasks_card.html',
+            fetch=fetch, interval=300, setup=setup, requires=['monday_sdk'], upstreams=['monday'])
@@ -0,0 +1,33 @@
+"""
+Current conditions and a 5 day forecast from OpenWeather.
+"""
+import os
+from os import getenv
+
+from cards import Card, lazy
+
+OPENWEATHER_TOKEN = getenv("OPENWEATHER_TOKEN")
+CITY = getenv("CITY")
+
+# OpenWeather API URLs
+OPENWEATHER_API_URL_CURRENT = f"https://api.openweathermap.org/data/2.5/weather?q={CITY}&units=imperial&appid={OPENWEATHER_TOKEN}"
+OPENWEATHER_API_URL_HOURLY = f"https://api.openweathermap.org/data/2.5/forecast/?q={CITY}&units=imperial&appid={OPENWEATHER_TOKEN}"
+
+
+@lazy
+def icons(dash):
+    import weather
+
+    # OpenWeather icons are downloaded once into static/ and served locally
+    return weather.IconCache(os.path.join(dash.app.static_folder, "icons"), "/static/icons")
+
+
+def fetch(dash):
+    import weather
+
+    # Call your Weather API here
+    return weather.fetch_weather(OPENWEATHER_API_URL_CURRENT, OPENWEATHER_API_URL_HOURLY, icons(dash))
+
+
+card = Card('weather', "Weather", '/get-weather', 'partials/weather_card.html',
+            fetch=fetch, interval=300, requires=['requests'], upstreams=['openweather'])
@@ -0,0 +1,31 @@
+import sqlite3
+import threading
+import weakref
+
+
+class Database:
+    """
+    A SQLite file in WAL mode (readers never block the writer) with one
+    connection per thread, opened the first time that thread needs it and
+    reused after that, so a query doesn't pay for opening a connection and
+    setting its PRAGMAs every time. A thread's connection is closed when the
+    thread goes away. Use `with db.connect() as conn:` for a transaction.
+    """
+    def __init__(self, path, schema=""):
+        self.path = path
+        self._local = threading.local()
+
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            if schema:
+                db.executescript(schema)
+
+    def connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Only ever used by this thread, check_same_thread is off so the finalizer can close it
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            weakref.finalize(threading.current_thread(), db.close)
+        return db
@@ -0,0 +1,57 @@
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+
+import metrics
+from scheduler import CardCache
+
+# Rendered card fragments keyed by request path, each with the data fingerprint it was rendered from
+_rendered = CardCache(max_entries=128)
+
+
+def etag_response(body, etag=None):
+    """
+    Sends a fragment with a strong content hash ETag, or a 304 if the
+    browser's If-None-Match already matches it.
+    """
+    response = make_response(body)
+    response.set_etag(etag or hashlib.sha1(body.encode()).hexdigest())
+    # Always revalidate, the 304 is what keeps repeat polls cheap
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def render_cached(fingerprint, render):
+    """
+    Calls render() only if fingerprint changed since the last render of this
+    path, otherwise reuses the stored fragment (and its ETag).
+    """
+    entry = _rendered.get(request.full_path)
+    if entry and entry['value']['fingerprint'] == fingerprint:
+        cached = entry['value']
+        metrics.FRAGMENT_CACHE.inc(result='hit')
+    else:
+        metrics.FRAGMENT_CACHE.inc(result='miss')
+        body = render()
+        cached = {'fingerprint': fingerprint, 'body': body, 'etag': hashlib.sha1(body.encode()).hexdigest()}
+        _rendered.set(request.full_path, cached, 86400)
+
+    return etag_response(cached['body'], cached['etag'])
+
+
+def cached_fragment(fingerprint=None):
+    """
+    Route decorator: fingerprint() returns something that changes whenever the
+    card's inputs do. Without one the route renders every time but still gets
+    an ETag and 304s.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if fingerprint is None:
+                return etag_response(view(*args, **kwargs))
+
+            return render_cached(fingerprint(), lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
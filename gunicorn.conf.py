@@ -0,0 +1,18 @@
+# Multi-process production config: gunicorn -c gunicorn.conf.py app:app
+import os
+from os import getenv
+
+# Every worker shares this card cache, so adding workers doesn't add API calls
+os.environ.setdefault("CARD_CACHE_PATH", "card_cache.db")
+
+bind = f"{getenv('HOST') or '127.0.0.1'}:{getenv('PORT') or 8080}"
+workers = int(getenv("WORKERS") or 2)
+
+# Threaded workers so the long lived /events streams don't tie up a whole worker
+worker_class = "gthread"
+threads = int(getenv("THREADS") or 8)
+
+def post_worker_init(worker):
+    # Each worker runs the background services, leases in the shared cache stop them doubling up
+    import app
+    app.start_background()
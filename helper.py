@@ -1,9 +1,10 @@
 import calendar
-from datetime import datetime
+from datetime import datetime, date
 
-import speedtest, json
-
-def get_calendar_data():
+def get_calendar_data(event_days=()):
+    """
+    Builds the month grid, event_days is a set of dates that have events on them.
+    """
     now = datetime.now()
     year = now.year
     month = now.month
@@ -23,7 +24,7 @@ def get_calendar_data():
             week_data.append({
                 "day": day_num if day_num != 0 else None,
                 "is_today": (day_num == today),
-                "has_event": False # You can add logic here to check your DB
+                "has_event": day_num != 0 and date(year, month, day_num) in event_days
             })
         formatted_weeks.append(week_data)
         
@@ -33,87 +34,67 @@ def get_calendar_data():
         "calendar_weeks": formatted_weeks
     }
 
-def sort_forecast_hours_to_days(forecast_hours):
-    forecast_days = []
-    prev_day = -1
-    for hour in forecast_hours:
-        icon = f"<img src=https://openweathermap.org/img/wn/{hour['weather'][0]['icon']}.png>"
-        hour['icon_PNG'] = icon
-
-        hour['formatted_time'] = datetime.fromtimestamp(hour['dt']).strftime('%#I %p')
-
-        if forecast_days == []:
-            forecast_days.append({"day": datetime.fromtimestamp(hour['dt']).strftime('%A, %B %#d, %Y'),
-                                  "hour_data": [hour]})
-        elif datetime.fromtimestamp(hour['dt']).day == prev_day:
-            forecast_days[-1]["hour_data"].append(hour)
-        else:
-            forecast_days.append({"day": datetime.fromtimestamp(hour['dt']).strftime('%A, %B %#d, %Y'),
-                                  "hour_data": [hour]})
-        prev_day = datetime.fromtimestamp(hour['dt']).day
-    return forecast_days
+def task_sort_key(t):
+    """
+    Sort key for tasks:
+    1. Active tasks first, 'Done' tasks last.
+    2. Within active tasks, sort by Date (ascending).
+    3. Tasks with NO date go after active tasks WITH date.
+    """
+    # 1. Status Weight: 0 for active, 1 for 'Done' (pushes Done to bottom)
+    status_weight = 1 if t['status'] == 'Done' else 0
     
-def log_network_data(time: int):
-    ping = 0.00
-    upload = 0.00
-    download = 0.00
-    attempt = 0
-    while download == 0.00 and attempt < 5:
+    # 2. Date Weight: Convert YYYY-MM-DD to a sortable number
+    # If date is None, use a massive number (Year 3000) so it drops to bottom of the active list
+    if t['due_date']:
         try:
-            st = speedtest.Speedtest(secure=True)
-
-            # Finds the best server based on ping
-            st.get_best_server()
-
-            # Results are returned in bits per second; divide by 10**6 for Mbps
-            ping = st.results.ping
-            download = st.download() / 1_000_000
-            upload = st.upload() / 1_000_000
-        except Exception as e:
-            print(e)
-        attempt += 1
+            date_val = datetime.strptime(t['due_date'], "%Y-%m-%d").timestamp()
+        except ValueError:
+            date_val = 32503680000.0 # Fallback for bad dates
+    else:
+        date_val = 32503680000.0 # Year 3000 (No date = bottom of active list)
 
+    return (status_weight, date_val)
 
-    net_db = None
-    try:
-        with open("network_db.json", "r") as db_file:
-            db = json.load(db_file)
-        
-        # print({'ping': ping, 'download': download, 'upload': upload})
-        db['time'].pop(0)
-        db['time'].append({'ping': ping, 'download': download, 'upload': upload})
+def sort_tasks(task_list):
+    """
+    Sorts tasks using task_sort_key (active by date, then undated, then 'Done').
+    """
+    return sorted(task_list, key=task_sort_key)
 
-        with open("network_db.json", "w") as db_file:
-            json.dump(db, db_file, indent=4)
+def sparkline_points(values, width=100, height=20, top=None):
+    """
+    SVG polyline points for a small history chart. Scaled to top (e.g. 100 for
+    percentages) or to the largest value if not given.
+    """
+    if len(values) < 2:
+        return ""
 
-        net_db = db
-    except Exception as e:
-        print(e)
-        net_db = None
-    
-    return net_db
+    top = top or max(values) or 1
+    step = width / (len(values) - 1)
+    return " ".join(f"{i * step:.1f},{height - min(v / top, 1) * height:.1f}" for i, v in enumerate(values))
 
-def sort_tasks(task_list):
+def format_age(seconds):
     """
-    Sorts tasks:
-    1. Active tasks first, 'Done' tasks last.
-    2. Within active tasks, sort by Date (ascending).
-    3. Tasks with NO date go after active tasks WITH date.
+    Turns an age in seconds into a short label like "5m" or "3h".
     """
-    def task_sort_key(t):
-        # 1. Status Weight: 0 for active, 1 for 'Done' (pushes Done to bottom)
-        status_weight = 1 if t['status'] == 'Done' else 0
-        
-        # 2. Date Weight: Convert YYYY-MM-DD to a sortable number
-        # If date is None, use a massive number (Year 3000) so it drops to bottom of the active list
-        if t['due_date']:
-            try:
-                date_val = datetime.strptime(t['due_date'], "%Y-%m-%d").timestamp()
-            except ValueError:
-                date_val = 32503680000.0 # Fallback for bad dates
-        else:
-            date_val = 32503680000.0 # Year 3000 (No date = bottom of active list)
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{int(seconds // size)}{unit}"
+    return f"{int(seconds)}s"
 
-        return (status_weight, date_val)
+def format_rate(bytes_per_sec):
+    """
+    Turns a byte rate into a short label like "12.3 KB/s".
+    """
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if bytes_per_sec < 1024:
+            return f"{bytes_per_sec:.1f} {unit}"
+        bytes_per_sec /= 1024
+    return f"{bytes_per_sec:.1f} GB/s"
 
-    return sorted(task_list, key=task_sort_key)
+def chunks(items, size):
+    """
+    Splits items into lists of at most size, for APIs that cap ids per call.
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
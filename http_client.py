@@ -0,0 +1,335 @@
+import json
+import random
+import threading
+import time
+from os import getenv
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from database import Database
+
+# (connect, read) timeouts in seconds for each upstream, anything unlisted uses 'default'
+TIMEOUTS = {
+    'openweather': (3, 10),
+    '17track': (5, 20),
+    'monday': (5, 30),
+    'steam': (3, 10),
+    # Image CDNs, not the APIs, so they don't count against the API quotas
+    'openweather-icons': (3, 10),
+    'steam-avatars': (3, 10),
+    'canvas': (3, 10),
+    'news': (5, 15),
+    'ical': (5, 30),
+    'default': (5, 15),
+}
+
+# Statuses worth another try, everything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Calls a day each provider's free tier allows, override with UPSTREAM_QUOTAS=steam:50000,monday:200
+DAILY_QUOTAS = {
+    'openweather': 1000,
+    '17track': 1000,
+    'monday': 1000,
+    'steam': 100000,
+}
+
+
+def parse_quotas(raw):
+    """
+    "steam:50000,monday:200" -> {'steam': 50000, 'monday': 200}
+    """
+    quotas = {}
+    for item in (raw or "").replace(",", " ").split():
+        provider, _, per_day = item.partition(":")
+        if per_day.isdigit():
+            quotas[provider] = int(per_day)
+    return quotas
+
+
+class QuotaExceeded(requests.RequestException):
+    """
+    Raised instead of sending a call once the provider's daily quota is used up.
+    """
+
+
+QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotas (provider TEXT PRIMARY KEY, tokens REAL, updated REAL);
+"""
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent traffic so a dead upstream gets one
+    call per request instead of a retry storm. Every call deposits `ratio`
+    tokens (up to `limit`) and every retry withdraws one.
+    """
+    def __init__(self, ratio=0.2, limit=10):
+        self.ratio = ratio
+        self.limit = limit
+        self.tokens = limit
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.limit)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Quota:
+    """
+    Token bucket for a provider's daily call limit: refills at per_day / 86400
+    tokens a second and holds an hour's worth at most, so a burst can't spend
+    the whole day at once. Every call (retries too) takes one token.
+    """
+    def __init__(self, per_day):
+        self.per_day = per_day
+        self.capacity = max(per_day / 24, 10)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self._updated) * self.per_day / 86400, self.capacity)
+        self._updated = now
+
+    def take(self):
+        with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def level(self):
+        """
+        How full the bucket is, 0 to 1.
+        """
+        with self._lock:
+            self._refill()
+            return self.tokens / self.capacity
+
+
+class SharedQuota(Quota):
+    """
+    Quota kept in a SQLite file (the shared card cache), so every worker
+    process spends from the same bucket and a restart doesn't refill it.
+    Refilling and taking a token is one UPDATE, so two processes can't both
+    take the last one.
+    """
+    def __init__(self, per_day, db, provider):
+        super().__init__(per_day)
+        self.db = db
+        self.provider = provider
+        with self.db.connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO quotas (provider, tokens, updated) VALUES (?, ?, ?)",
+                         (provider, self.capacity, time.time()))
+
+    def _available(self):
+        # The bucket's level right now, as SQL: stored tokens plus the refill since they were stored
+        return f"MIN(tokens + (:now - updated) * {self.per_day / 86400!r}, {self.capacity!r})"
+
+    def take(self):
+        with self.db.connect() as conn:
+            cursor = conn.execute(f"""UPDATE quotas SET tokens = {self._available()} - 1, updated = :now
+                                      WHERE provider = :provider AND {self._available()} >= 1""",
+                                  {'now': time.time(), 'provider': self.provider})
+            return cursor.rowcount == 1
+
+    def level(self):
+        with self.db.connect() as conn:
+            row = conn.execute(f"SELECT {self._available()} FROM quotas WHERE provider = :provider",
+                               {'now': time.time(), 'provider': self.provider}).fetchone()
+        return row[0] / self.capacity if row else 1
+
+
+class SingleFlight:
+    """
+    Lets identical calls made at the same time share one: the first caller
+    makes it and everyone who asks while it's in flight gets its result (or
+    its exception).
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, call):
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['result'], False
+
+        try:
+            flight['result'] = call()
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight['done'].set()
+        return flight['result'], True
+
+
+class HttpClient:
+    """
+    One pooled requests.Session shared by every card, so connections (and
+    their TLS handshakes) are reused per host instead of opened per call.
+    Every call gets the provider's timeouts, retries with capped exponential
+    backoff (within the provider's retry budget) and is timed.
+    Identical GETs in flight at the same time are only sent once, and
+    providers with a daily quota get a Quota that refuses calls once it's
+    spent (slowdown() tells the scheduler to back off well before that).
+    With quota_path the quotas live in that SQLite file, shared by every
+    process using it.
+    """
+    def __init__(self, pool_size=10, retries=2, backoff=0.5, max_backoff=8, redirect=None,
+                 quotas=DAILY_QUOTAS, quota_path=None):
+        self.retries = retries
+        # e.g. http://127.0.0.1:9000 sends every call there as /<host>/<path> (the offline benchmark stubs)
+        self.redirect = redirect
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budgets = {}
+        if quota_path:
+            db = Database(quota_path, QUOTA_SCHEMA)
+            self.quotas = {provider: SharedQuota(per_day, db, provider) for provider, per_day in quotas.items()}
+        else:
+            self.quotas = {provider: Quota(per_day) for provider, per_day in quotas.items()}
+        self._flights = SingleFlight()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _budget(self, provider):
+        if provider not in self.budgets:
+            self.budgets[provider] = RetryBudget()
+        return self.budgets[provider]
+
+    def _delay(self, attempt, response=None):
+        # Honour a short Retry-After, otherwise full jitter exponential backoff
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            return min(int(response.headers["Retry-After"]), self.max_backoff)
+
+        return random.uniform(0, min(self.backoff * 2 ** attempt, self.max_backoff))
+
+    def slowdown(self, providers):
+        """
+        How many times longer something calling these providers should wait
+        between calls: 1 while every quota is at least half full, rising to
+        10 as one runs dry.
+        """
+        levels = {p: self.quotas[p].level() for p in providers if p in self.quotas}
+        for provider, level in levels.items():
+            metrics.UPSTREAM_QUOTA.set(level, provider=provider)
+
+        level = min(levels.values(), default=1)
+        return 1 if level >= 0.5 else min(0.5 / max(level, 0.05), 10)
+
+    def spend(self, provider):
+        """
+        Takes one call from the provider's quota, for calls that don't go
+        through this client (e.g. the Monday SDK). Raises QuotaExceeded if it's spent.
+        """
+        quota = self.quotas.get(provider)
+        if quota is not None and not quota.take():
+            metrics.UPSTREAM_ERRORS.inc(provider=provider, error="quota")
+            raise QuotaExceeded(f"{provider} daily quota used up")
+
+    def request(self, provider, method, url, coalesce=None, **kwargs):
+        """
+        Same as requests.request but pooled, with timeouts and retries.
+        Raises the last connection error if every attempt failed.
+        GETs are coalesced with identical ones already in flight, pass
+        coalesce=True for a POST that only reads (or False to opt out).
+        """
+        if coalesce is None:
+            coalesce = method == "GET"
+        if not coalesce:
+            return self._request(provider, method, url, **kwargs)
+
+        key = (provider, method, url, json.dumps(kwargs, sort_keys=True, default=str))
+        response, sent = self._flights.do(key, lambda: self._request(provider, method, url, **kwargs))
+        if not sent:
+            metrics.UPSTREAM_COALESCED.inc(provider=provider)
+        return response
+
+    def _request(self, provider, method, url, **kwargs):
+        self.spend(provider)
+        kwargs.setdefault('timeout', TIMEOUTS.get(provider, TIMEOUTS['default']))
+        budget = self._budget(provider)
+        budget.deposit()
+        parts = urlsplit(url)
+        host = parts.netloc
+        if self.redirect:
+            url = f"{self.redirect}/{host}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            response = None
+            error = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            elapsed = time.perf_counter() - start
+            status = response.status_code if response is not None else None
+            metrics.UPSTREAM_SECONDS.observe(elapsed, provider=provider)
+            metrics.UPSTREAM_REQUESTS.inc(provider=provider, status=status or 'error')
+            if error is not None:
+                metrics.UPSTREAM_ERRORS.inc(provider=provider, error=type(error).__name__)
+            elif status >= 400:
+                metrics.UPSTREAM_ERRORS.inc(provider=provider, error=f"http_{status}")
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            # A retry costs quota like any other call
+            quota = self.quotas.get(provider)
+            if not retryable or attempt >= self.retries or not budget.withdraw() or (quota and not quota.take()):
+                if error is not None:
+                    raise error
+                return response
+
+            metrics.UPSTREAM_RETRIES.inc(provider=provider)
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def get(self, provider, url, **kwargs):
+        return self.request(provider, "GET", url, **kwargs)
+
+    def post(self, provider, url, **kwargs):
+        return self.request(provider, "POST", url, **kwargs)
+
+    def get_json(self, provider, url, **kwargs):
+        """
+        GET that raises on an error status and returns the decoded JSON body.
+        """
+        response = self.get(provider, url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+
+# Shared instance used across the app (UPSTREAM_QUOTAS adds to or overrides DAILY_QUOTAS). With
+# several workers (CARD_CACHE_PATH, see serve.py) the quotas go in the card cache file so they share one budget
+http = HttpClient(quotas={**DAILY_QUOTAS, **parse_quotas(getenv("UPSTREAM_QUOTAS"))},
+                  quota_path=getenv("CARD_CACHE_PATH") or None)
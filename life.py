@@ -0,0 +1,131 @@
+import json
+import random
+import threading
+import time
+
+from push import EventBus
+
+
+def _full_add(a, b, c):
+    # Adds three bit-packed rows column by column, returns (sum bits, carry bits)
+    return a ^ b ^ c, (a & b) | (c & (a ^ b))
+
+
+def next_row(above, row, below, mask):
+    """
+    Next generation of one bit-packed row (bit x is column x) from the rows
+    around it. The eight neighbour counts are added for every column at once
+    with bitwise adders, so a row costs a few dozen int operations whatever
+    its width.
+    """
+    left = lambda r: (r << 1) & mask
+    right = lambda r: r >> 1
+
+    s1, c1 = _full_add(left(above), above, right(above))
+    s2, c2 = _full_add(left(below), below, right(below))
+    s3, c3 = left(row) ^ right(row), left(row) & right(row)
+
+    ones, c4 = _full_add(s1, s2, s3)
+    t, k1 = _full_add(c1, c2, c3)
+    twos = t ^ c4
+    # An 8 count wraps to 0, which is dead either way
+    fours = k1 ^ (t & c4)
+
+    # Alive with exactly 3 neighbours, or 2 if it already was
+    return twos & ~fours & (ones | row) & mask
+
+
+class Life:
+    """
+    Conway's Game of Life on a cols x rows grid with dead edges, each row
+    kept as one bit-packed int. Only rows next to a row that changed last
+    generation can change, so step() skips everything else and settled parts
+    of the grid cost nothing.
+    """
+    def __init__(self, cols, rows, density=0.35):
+        self.cols = cols
+        self.rows = rows
+        self.density = density
+        self.mask = (1 << cols) - 1
+        self.seed()
+
+    def seed(self):
+        self.grid = [sum(1 << x for x in range(self.cols) if random.random() < self.density)
+                     for _ in range(self.rows)]
+        self.generation = 0
+        self._active = set(range(self.rows))
+
+    def step(self):
+        """
+        Advances one generation, returns {row: flipped bits} for the rows that changed.
+        """
+        grid = self.grid
+        candidates = {y + d for y in self._active for d in (-1, 0, 1) if 0 <= y + d < self.rows}
+
+        new = list(grid)
+        flips = {}
+        for y in candidates:
+            above = grid[y - 1] if y > 0 else 0
+            below = grid[y + 1] if y < self.rows - 1 else 0
+            row = next_row(above, grid[y], below, self.mask)
+            if row != grid[y]:
+                new[y] = row
+                flips[y] = row ^ grid[y]
+
+        self.grid = new
+        self._active = set(flips)
+        self.generation += 1
+        return flips
+
+
+class LifeRunner:
+    """
+    Steps a Life every `interval` seconds in its own thread while anyone is
+    watching, and streams each generation's flipped cells to them as
+    server-sent events. A new client first gets the whole grid ('frame'),
+    then one 'delta' per generation. Rows are sent as hex, bit x is column x.
+    A client that falls behind (e.g. a throttled background tab) gets a fresh
+    frame in place of the deltas it hasn't read. The grid is re-seeded once
+    it stops changing.
+    """
+    def __init__(self, cols=160, rows=100, interval=0.2):
+        self.life = Life(cols, rows)
+        self.interval = interval
+        self.bus = EventBus(max_queued=50, resync=lambda: [('frame', self.frame())])
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def frame(self):
+        with self._lock:
+            return json.dumps({'g': self.life.generation, 'cols': self.life.cols, 'rows': self.life.rows,
+                               'cells': [format(row, "x") for row in self.life.grid]})
+
+    def stream(self):
+        # The frame is taken after subscribing, so no delta can fall between the two
+        return self.bus.stream(first=self.bus.resync)
+
+    def tick(self):
+        with self._lock:
+            flips = self.life.step()
+            generation = self.life.generation
+            if not flips:
+                self.life.seed()
+        if not flips:
+            self.bus.publish('frame', self.frame())
+            return
+
+        self.bus.publish('delta', json.dumps({'g': generation,
+                                              'flips': [[y, format(bits, "x")] for y, bits in flips.items()]}))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="life", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            started = time.monotonic()
+            # Nobody watching, don't burn the CPU
+            if self.bus.clients():
+                self.tick()
+            time.sleep(max(self.interval - (time.monotonic() - started), 0.01))
@@ -0,0 +1,235 @@
+import threading
+import time
+
+from flask import g, request, Response, before_render_template, template_rendered
+
+# Seconds, roughly from a cached fragment up to a slow upstream
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Count of something, per combination of label values.
+    """
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """
+    A value that goes up and down, per combination of label values.
+    """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """
+    Distribution of durations (seconds), per combination of label values.
+    Rendered with cumulative buckets, _sum and _count like Prometheus expects.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def time(self, **labels):
+        """
+        Context manager that observes how long its block took.
+        """
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: {'counts': list(s['counts']), 'sum': s['sum'], 'count': s['count']}
+                      for key, s in self._values.items()}
+
+        lines = []
+        for key, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', '+Inf')])} {series['count']}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(series['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, labels=()):
+        metric = Gauge(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram("dashboard_request_seconds", "Time to answer a request, by route",
+                                     ("route", "method", "status"))
+RENDER_SECONDS = registry.histogram("dashboard_render_seconds", "Time to render a template", ("template",))
+UPSTREAM_SECONDS = registry.histogram("dashboard_upstream_seconds", "Time for one call to an upstream API, by provider",
+                                      ("provider",))
+UPSTREAM_REQUESTS = registry.counter("dashboard_upstream_requests_total", "Calls to upstream APIs, by provider and status",
+                                     ("provider", "status"))
+UPSTREAM_ERRORS = registry.counter("dashboard_upstream_errors_total", "Upstream calls that got no response or an error status",
+                                   ("provider", "error"))
+UPSTREAM_RETRIES = registry.counter("dashboard_upstream_retries_total", "Upstream calls that were retried", ("provider",))
+UPSTREAM_COALESCED = registry.counter("dashboard_upstream_coalesced_total",
+                                      "Upstream calls answered by an identical call already in flight", ("provider",))
+UPSTREAM_QUOTA = registry.gauge("dashboard_upstream_quota", "How full each provider's daily quota bucket is (0 to 1)",
+                                ("provider",))
+REFRESH_SECONDS = registry.histogram("dashboard_refresh_seconds", "Time for a card's background fetch", ("card",))
+REFRESH_ERRORS = registry.counter("dashboard_refresh_errors_total", "Card fetches that raised", ("card",))
+CARD_CACHE = registry.counter("dashboard_card_cache_total", "Card data lookups by result (fresh, stale or miss)",
+                              ("card", "result"))
+FRAGMENT_CACHE = registry.counter("dashboard_fragment_cache_total", "Rendered fragment lookups by result (hit or miss)",
+                                  ("result",))
+ERRORS = registry.counter("dashboard_errors_total", "Errors caught and printed, by where they happened", ("source",))
+
+
+def error(source, e, detail=None):
+    """
+    Prints an error the way the rest of the app does ("Source Error (detail): e")
+    and counts it by source.
+    """
+    print(f"{source} Error ({detail}): {e}" if detail is not None else f"{source} Error: {e}")
+    ERRORS.inc(source=source)
+
+
+def instrument(app, slow_ms=None):
+    """
+    Times every request and template render on app and adds /metrics
+    (localhost only, like every other non webhook route). Requests slower than
+    slow_ms milliseconds are printed.
+    """
+    local = threading.local()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+
+        elapsed = time.perf_counter() - start
+        # The route pattern, not the path, so query strings and ids don't blow up the label count
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            print(f"Slow Request: {request.method} {request.full_path.rstrip('?')} {response.status_code} {elapsed * 1000:.0f}ms")
+        return response
+
+    def start_render(sender, template, context, **extra):
+        local.render_start = time.perf_counter()
+
+    def record_render(sender, template, context, **extra):
+        start = getattr(local, 'render_start', None)
+        if start is not None:
+            RENDER_SECONDS.observe(time.perf_counter() - start, template=template.name)
+            local.render_start = None
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(record_render, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
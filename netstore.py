@@ -0,0 +1,146 @@
+import json
+import time
+from os.path import exists
+
+import metrics
+from database import Database
+
+HOUR = 3600
+DAY = 86400
+
+FIELDS = ('ping', 'download', 'upload')
+
+# Each tier has the same columns, hourly/daily rows also keep how many samples they average
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw (ts REAL NOT NULL, ping REAL, download REAL, upload REAL);
+CREATE INDEX IF NOT EXISTS raw_ts ON raw (ts);
+CREATE TABLE IF NOT EXISTS hourly (ts INTEGER PRIMARY KEY, ping REAL, download REAL, upload REAL, samples INTEGER);
+CREATE TABLE IF NOT EXISTS daily (ts INTEGER PRIMARY KEY, ping REAL, download REAL, upload REAL, samples INTEGER);
+"""
+
+# Folds rows older than the cutoff into buckets of the next tier, merging
+# (sample weighted) with any bucket that already exists there
+DOWNSAMPLE = """
+INSERT INTO {dest} (ts, ping, download, upload, samples)
+SELECT CAST(ts / {size} AS INTEGER) * {size} AS bucket,
+       SUM(ping * {weight}) / SUM({weight}),
+       SUM(download * {weight}) / SUM({weight}),
+       SUM(upload * {weight}) / SUM({weight}),
+       SUM({weight})
+FROM {src} WHERE ts < ? GROUP BY bucket
+ON CONFLICT (ts) DO UPDATE SET
+    ping = (ping * samples + excluded.ping * excluded.samples) / (samples + excluded.samples),
+    download = (download * samples + excluded.download * excluded.samples) / (samples + excluded.samples),
+    upload = (upload * samples + excluded.upload * excluded.samples) / (samples + excluded.samples),
+    samples = samples + excluded.samples
+"""
+
+
+class NetworkStore:
+    """
+    Append-only SQLite time series for speedtest results (ping, download, upload).
+    New samples land in the raw tier. Once older than raw_retention they are
+    averaged into hourly buckets, hourly buckets older than hourly_retention
+    into daily ones, and daily ones are dropped after daily_retention.
+    Every write is a single transaction in WAL mode so a crash can't leave a
+    half written file, and readers never block the writer.
+    """
+    def __init__(self, path="network.db", raw_retention=2 * DAY, hourly_retention=90 * DAY, daily_retention=5 * 365 * DAY):
+        self.path = path
+        self.raw_retention = raw_retention
+        self.hourly_retention = hourly_retention
+        self.daily_retention = daily_retention
+        self._db = Database(path, SCHEMA)
+
+    def append(self, result):
+        """
+        Stores one probe result ({'ping', 'download', 'upload', 'measured_at'})
+        and rolls older data down into the coarser tiers.
+        """
+        ts = result.get('measured_at') or time.time()
+        with self._db.connect() as db:
+            db.execute("INSERT INTO raw (ts, ping, download, upload) VALUES (?, ?, ?, ?)",
+                       (ts, result['ping'], result['download'], result['upload']))
+        self.compact()
+
+    def compact(self, now=None):
+        now = now or time.time()
+        # Cutoffs are bucket aligned so a bucket is only ever folded down once
+        raw_cutoff = int(now - self.raw_retention) // HOUR * HOUR
+        hourly_cutoff = int(now - self.hourly_retention) // DAY * DAY
+
+        with self._db.connect() as db:
+            db.execute(DOWNSAMPLE.format(src="raw", dest="hourly", size=HOUR, weight=1), (raw_cutoff,))
+            db.execute("DELETE FROM raw WHERE ts < ?", (raw_cutoff,))
+            db.execute(DOWNSAMPLE.format(src="hourly", dest="daily", size=DAY, weight="samples"), (hourly_cutoff,))
+            db.execute("DELETE FROM hourly WHERE ts < ?", (hourly_cutoff,))
+            db.execute("DELETE FROM daily WHERE ts < ?", (now - self.daily_retention,))
+
+    def query(self, start, end=None):
+        """
+        Returns [{'ts', 'ping', 'download', 'upload'}, ...] between start and end
+        (epoch seconds) in time order, at whatever resolution each stretch
+        of history is still kept at.
+        """
+        end = end or time.time()
+        rows = []
+        with self._db.connect() as db:
+            for table in ("daily", "hourly", "raw"):
+                rows += db.execute(f"SELECT ts, ping, download, upload FROM {table} WHERE ts >= ? AND ts <= ? ORDER BY ts",
+                                   (start, end)).fetchall()
+
+        return [{'ts': ts, 'ping': ping, 'download': download, 'upload': upload} for ts, ping, download, upload in rows]
+
+    def series(self, start, bucket=None, end=None):
+        """
+        query() as one time ordered list of [ts, value] per field, for charts.
+        With a bucket (seconds) each bucket only keeps its lowest and highest
+        value, so a long range stays small and its spikes still show. Buckets
+        are aligned to the epoch, so the same stretch always gets the same
+        buckets. Also returns where the last bucket starts: it can still get
+        samples, so an incremental caller should re-ask from there.
+        """
+        samples = self.query(start, end)
+        series = {field: [] for field in FIELDS}
+        if not samples:
+            return series, None
+
+        key = (lambda ts: int(ts // bucket) * bucket) if bucket else (lambda ts: ts)
+        groups = {}
+        for sample in samples:
+            groups.setdefault(key(sample['ts']), []).append(sample)
+
+        for group in groups.values():
+            for field in FIELDS:
+                low = min(group, key=lambda s: s[field])
+                high = max(group, key=lambda s: s[field])
+                for sample in sorted({id(low): low, id(high): high}.values(), key=lambda s: s['ts']):
+                    # Whole seconds and two decimals are plenty for a chart, and half the size
+                    series[field].append([int(sample['ts']), round(sample[field], 2)])
+
+        return series, max(groups)
+
+    def is_empty(self):
+        with self._db.connect() as db:
+            return not any(db.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() for table in ("raw", "hourly", "daily"))
+
+    def import_legacy(self, path="network_db.json"):
+        """
+        One time import of the old 24 slot network_db.json, treating the slots
+        as the last 24 hours. Does nothing once the store has data.
+        """
+        if not exists(path) or not self.is_empty():
+            return
+
+        try:
+            with open(path, "r") as db_file:
+                slots = json.load(db_file)['time']
+        except Exception as e:
+            metrics.error("Network Import", e, path)
+            return
+
+        last_hour = int(time.time()) // HOUR * HOUR
+        with self._db.connect() as db:
+            db.executemany("INSERT INTO raw (ts, ping, download, upload) VALUES (?, ?, ?, ?)",
+                           [(last_hour - (len(slots) - 1 - i) * HOUR, s['ping'], s['download'], s['upload'])
+                            for i, s in enumerate(slots)])
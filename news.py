@@ -0,0 +1,146 @@
+import calendar
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+
+import feedparser
+
+from http_client import http
+import metrics
+from database import Database
+
+DEFAULT_FEEDS = ["https://feeds.feedburner.com/TheHackersNews"]
+
+# Every feed is polled side by side
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="news")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (url TEXT PRIMARY KEY, title TEXT, etag TEXT, last_modified TEXT, fetched_at REAL);
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    feed TEXT,
+    title TEXT,
+    link TEXT,
+    published REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS entries_link ON entries (link);
+CREATE INDEX IF NOT EXISTS entries_published ON entries (published);
+"""
+
+
+def parse_feeds(raw):
+    """
+    Splits NEWS_FEEDS (comma or whitespace separated urls), falls back to DEFAULT_FEEDS.
+    """
+    feeds = [url for url in (raw or "").replace(",", " ").split() if url]
+    return list(dict.fromkeys(feeds)) or DEFAULT_FEEDS
+
+
+def _published(entry, fallback):
+    # feedparser normalises every date format it understands into a UTC struct_time
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    return calendar.timegm(parsed) if parsed else fallback
+
+
+def _entry_id(entry):
+    # GUID if the feed has one, else the link, else the title as a last resort
+    key = entry.get('id') or entry.get('link') or entry.get('title', '')
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def format_published(ts):
+    published = datetime.fromtimestamp(ts)
+    if published.date() == date.today():
+        return published.strftime("%H:%M")
+    return published.strftime("%b %d")
+
+
+class NewsStore:
+    """
+    Polls a list of RSS / Atom feeds in parallel and keeps their entries in
+    SQLite. Each feed is fetched with ETag / Last-Modified so an unchanged feed
+    costs a 304, entries are stored once (by GUID, or link if there is none,
+    so the same story from two feeds only shows once) and dropped after
+    retention seconds. latest() merges every feed by published time.
+    """
+    def __init__(self, feeds, path="news.db", retention=7 * 86400):
+        self.feeds = feeds
+        self.path = path
+        self.retention = retention
+        self._db = Database(path, SCHEMA)
+
+    def _fetch(self, url):
+        """
+        Fetches one feed, returns how many new entries it had.
+        """
+        with self._db.connect() as db:
+            row = db.execute("SELECT etag, last_modified FROM feeds WHERE url = ?", (url,)).fetchone()
+        etag, last_modified = row or (None, None)
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        response = http.get('news', url, headers=headers)
+        if response.status_code == 304:
+            return 0
+        response.raise_for_status()
+
+        now = time.time()
+        feed = feedparser.parse(response.content)
+        title = feed.feed.get('title') or url
+        rows = [(_entry_id(entry), url, entry.get('title', ''), entry.get('link') or None, _published(entry, now))
+                for entry in feed.entries
+                if entry.get('title')]
+
+        with self._db.connect() as db:
+            before = db.total_changes
+            # OR IGNORE skips both GUIDs we already have and links another feed already gave us
+            db.executemany("INSERT OR IGNORE INTO entries (id, feed, title, link, published) VALUES (?, ?, ?, ?, ?)", rows)
+            added = db.total_changes - before
+            db.execute("""INSERT OR REPLACE INTO feeds (url, title, etag, last_modified, fetched_at)
+                          VALUES (?, ?, ?, ?, ?)""",
+                       (url, title, response.headers.get("ETag"), response.headers.get("Last-Modified"), now))
+
+        return added
+
+    def sync(self):
+        """
+        Polls every feed, returns True if any of them had new entries.
+        A feed that fails is printed and skipped, if they all fail the error
+        is raised so the scheduler keeps the last good card.
+        """
+        futures = [(url, _pool.submit(self._fetch, url)) for url in self.feeds]
+
+        added = 0
+        errors = []
+        for url, future in futures:
+            try:
+                added += future.result()
+            except Exception as e:
+                errors.append(e)
+                metrics.error("News Feed", e, url)
+
+        if errors and len(errors) == len(futures):
+            raise errors[0]
+
+        with self._db.connect() as db:
+            db.execute("DELETE FROM entries WHERE published < ?", (time.time() - self.retention,))
+
+        return added > 0
+
+    def latest(self, limit=5):
+        """
+        Newest `limit` entries across every feed as {'title', 'link', 'source', 'published', 'published_at'}.
+        """
+        with self._db.connect() as db:
+            rows = db.execute("""SELECT entries.title, entries.link, COALESCE(feeds.title, entries.feed), entries.published
+                                 FROM entries LEFT JOIN feeds ON feeds.url = entries.feed
+                                 ORDER BY entries.published DESC LIMIT ?""", (limit,)).fetchall()
+
+        return [{'title': title, 'link': link, 'source': source,
+                 'published': format_published(published), 'published_at': published}
+                for title, link, source, published in rows]
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+
+import metrics
+
+# First retry after a failed probe, doubled on every failure in a row
+RETRY_BASE = 60
+
+
+class BandwidthProbe:
+    """
+    Runs speedtest on a schedule in its own thread, never from a request.
+    Only one probe can run at a time (they saturate the uplink and skew each
+    other), the schedule gets random jitter so several dashboards on the same
+    network don't line up, and failures back off exponentially up to interval.
+    The latest result is kept on .latest and pushed to every subscriber.
+    Given a cache (see scheduler.CardCache / shared_cache.SharedCardCache) the
+    result and the probe lock live there, so several worker processes still
+    only ever run one probe at a time and all see the same result.
+    """
+    def __init__(self, interval=3600, jitter=300, cache=None):
+        self.interval = interval
+        self.jitter = jitter
+        self.cache = cache
+        self._latest = None
+        self.failures = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def latest(self):
+        if self.cache is None:
+            return self._latest
+
+        entry = self.cache.get('speedtest')
+        return entry['value'] if entry else None
+
+    def subscribe(self, callback):
+        """
+        callback(result) is called after every successful probe with
+        {'ping', 'download', 'upload', 'measured_at'} (ms, Mbps, Mbps, epoch).
+        """
+        self._listeners.append(callback)
+
+    def run_once(self):
+        """
+        Runs a single probe, returns the result or None if it failed or
+        another probe was already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        if self.cache is not None and not self.cache.claim('speedtest', 600):
+            self._lock.release()
+            return None
+
+        try:
+            # Imported on the first probe, not when the app loads
+            import speedtest
+
+            st = speedtest.Speedtest(secure=True)
+
+            # Finds the best server based on ping
+            st.get_best_server()
+
+            # Results are returned in bits per second; divide by 10**6 for Mbps
+            download = st.download() / 1_000_000
+            upload = st.upload() / 1_000_000
+            result = {'ping': st.results.ping,
+                      'download': download,
+                      'upload': upload,
+                      'measured_at': time.time()}
+        except Exception as e:
+            metrics.error("Speedtest", e)
+            self.failures += 1
+            return None
+        finally:
+            if self.cache is not None:
+                self.cache.release('speedtest')
+            self._lock.release()
+
+        self.failures = 0
+        self._latest = result
+        if self.cache is not None:
+            self.cache.set('speedtest', result, self.interval * 2)
+        for callback in self._listeners:
+            try:
+                callback(result)
+            except Exception as e:
+                metrics.error("Speedtest Listener", e)
+
+        return result
+
+    def next_delay(self):
+        if self.failures:
+            return min(RETRY_BASE * 2 ** (self.failures - 1), self.interval)
+
+        return self.interval + random.uniform(0, self.jitter)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="bandwidth-probe", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        # Small random delay on boot too, so restarts don't all probe at once
+        time.sleep(random.uniform(0, min(self.jitter, 30)))
+        while True:
+            # Skip our turn if another process probed recently
+            latest = self.latest
+            if not latest or time.time() - latest['measured_at'] >= self.interval:
+                self.run_once()
+            time.sleep(self.next_delay())
@@ -0,0 +1,142 @@
+import os
+import queue
+import threading
+import time
+from datetime import date
+
+import metrics
+
+
+class EventBus:
+    """
+    Fans server-sent events out to every connected browser.
+    Each client gets its own queue, a slow client only ever fills its own.
+    A client whose queue fills up is disconnected so its browser reconnects
+    and starts over from the current state, or, with resync, its queue is
+    replaced by what resync() returns ((event, data) pairs of the current
+    state) and it stays connected.
+    """
+    def __init__(self, max_queued=100, resync=None):
+        self.max_queued = max_queued
+        self.resync = resync
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        client = queue.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def clients(self):
+        return len(self._clients)
+
+    def _message(self, event, data):
+        # SSE data can't contain raw newlines, every line gets its own "data:" prefix
+        lines = "\n".join(f"data: {line}" for line in data.splitlines()) or "data: "
+        return f"event: {event}\n{lines}\n\n"
+
+    def publish(self, event, data):
+        message = self._message(event, data)
+        with self._lock:
+            clients = list(self._clients)
+
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                # Client stopped reading, what's queued is out of date anyway
+                with client.mutex:
+                    client.queue.clear()
+                if self.resync:
+                    for event, state in self.resync():
+                        client.put_nowait(self._message(event, state))
+                else:
+                    # None makes stream() end the response so the browser reconnects
+                    self.unsubscribe(client)
+                    client.put_nowait(None)
+
+    def stream(self, heartbeat=30, first=None):
+        """
+        Generator for a text/event-stream response. Sends a comment every
+        heartbeat seconds so proxies and browsers keep the connection open.
+        first() is called once the client is subscribed and returns
+        (event, data) pairs to send before anything published after it.
+        The stream opens with an event id, so when the browser reconnects it
+        sends a Last-Event-ID header and the server can tell it's been here before.
+        """
+        client = self.subscribe()
+        try:
+            yield "retry: 5000\nid: connected\n\n"
+            for event, data in (first() if first else ()):
+                yield self._message(event, data)
+            while True:
+                try:
+                    message = client.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if message is None:
+                    # Dropped by publish()
+                    return
+                yield message
+        finally:
+            self.unsubscribe(client)
+
+
+class ChangeWatcher:
+    """
+    Polls cheap local change sources (file modification times and the date)
+    in one background thread and calls back when one of them changes.
+    """
+    def __init__(self, interval=2):
+        self.interval = interval
+        self._files = {}
+        self._day_callbacks = []
+        self._today = date.today()
+        self._thread = None
+
+    def watch_file(self, path, callback):
+        self._files[path] = {'callback': callback, 'mtime': self._mtime(path)}
+
+    def on_new_day(self, callback):
+        self._day_callbacks.append(callback)
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def check(self, today=None):
+        for path, watched in self._files.items():
+            mtime = self._mtime(path)
+            if mtime != watched['mtime']:
+                watched['mtime'] = mtime
+                self._call(watched['callback'])
+
+        today = today or date.today()
+        if today != self._today:
+            self._today = today
+            for callback in self._day_callbacks:
+                self._call(callback)
+
+    def _call(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            metrics.error("Watcher", e)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="change-watcher", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
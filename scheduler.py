@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# How long to wait before trying a card again after its fetch failed
+RETRY_DELAY = 60
+
+# How long one process may hold a card's refresh lease (longer than any fetch should take)
+LEASE_SECONDS = 120
+
+
+class CardCache:
+    """
+    Thread safe TTL cache for card data.
+    Entries past their TTL are still handed out (marked stale) so a card always
+    has something to show, but anything older than max_age is evicted and the
+    least recently used entries are dropped once max_entries is reached.
+    """
+    def __init__(self, max_entries=64, max_age=86400):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns {'value', 'fetched_at', 'ttl', 'age', 'stale'} for the key, or
+        None if nothing has been cached yet.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+
+        age = time.time() - entry['fetched_at']
+        return {'value': entry['value'],
+                'fetched_at': entry['fetched_at'],
+                'ttl': entry['ttl'],
+                'age': age,
+                'stale': age >= entry['ttl']}
+
+    def set(self, key, value, ttl, fetched_at=None):
+        # fetched_at is only passed when restoring older data (e.g. a snapshot)
+        with self._lock:
+            self._entries[key] = {'value': value, 'fetched_at': fetched_at or time.time(), 'ttl': ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, keep=()):
+        """
+        Drops entries that have been sitting around longer than max_age,
+        except the keys in keep.
+        """
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e['fetched_at'] < cutoff and k not in keep]:
+                del self._entries[key]
+
+    # A single process never has to share, these only matter for SharedCardCache
+    def claim(self, name, seconds):
+        return True
+
+    def release(self, name):
+        pass
+
+
+class Scheduler:
+    """
+    Refreshes each registered card on its own interval in a small worker pool
+    and keeps the results in a CardCache.
+    Routes call get() which never touches the network: it returns the last good
+    value right away and, if that value is stale, queues a background refresh.
+    With a SharedCardCache several processes can each run a Scheduler: a card
+    is only fetched by the process holding its lease, the rest pick up the
+    result from the shared cache.
+    With a SnapshotStore every successful fetch is also saved to disk, and
+    start() puts those back so a restarted dashboard has data right away.
+    """
+    def __init__(self, cache=None, workers=4, snapshots=None):
+        self.cache = cache if cache is not None else CardCache()
+        self.snapshots = snapshots
+        self.jobs = {}
+        self._listeners = []
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="card-refresh")
+        self._in_flight = set()
+        # Cards forced while already running, run again as soon as that run ends
+        self._rerun = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, fetch, interval, slowdown=None):
+        """
+        fetch is called with no arguments and should return the card's data,
+        or raise if the upstream failed (the last good value is kept).
+        slowdown() returns how many times longer than interval to wait before
+        the next refresh (e.g. while an API's daily quota is running low).
+        """
+        self.jobs[name] = {'fetch': fetch, 'interval': interval, 'slowdown': slowdown, 'next_run': 0}
+
+    def subscribe(self, callback):
+        """
+        callback(name) is called after every successful refresh of a card.
+        """
+        self._listeners.append(callback)
+
+    def get_entry(self, name):
+        """
+        Returns the card's cache entry ({'value', 'fetched_at', 'age', 'stale'})
+        or None, queueing a refresh if it is missing or stale.
+        """
+        entry = self.cache.get(name)
+        metrics.CARD_CACHE.inc(card=name, result='miss' if entry is None else 'stale' if entry['stale'] else 'fresh')
+        if entry is None or entry['stale']:
+            if time.monotonic() >= self.jobs[name]['next_run']:
+                self.refresh(name)
+
+        return entry
+
+    def get(self, name):
+        entry = self.get_entry(name)
+        return entry['value'] if entry else None
+
+    def refresh(self, name, force=False):
+        """
+        Queues a refresh of one card unless one is already running.
+        force fetches even if the cached value is still fresh (e.g. after a webhook),
+        and if a refresh is already running it runs again once that one is done,
+        since that one may have read the data before the change.
+        """
+        with self._lock:
+            if name in self._in_flight:
+                if force:
+                    self._rerun.add(name)
+                return False
+            self._in_flight.add(name)
+
+        self._pool.submit(self._run, name, force)
+        return True
+
+    def _notify(self, name):
+        for callback in self._listeners:
+            try:
+                callback(name)
+            except Exception as e:
+                metrics.error("Refresh Listener", e, name)
+
+    def _run(self, name, force=False):
+        job = self.jobs[name]
+        interval = delay = job['interval']
+        try:
+            try:
+                interval = delay = job['interval'] * (job['slowdown']() if job['slowdown'] else 1)
+            except Exception as e:
+                # e.g. the shared quota file is locked, refresh at the normal pace this time
+                metrics.error("Slowdown", e, name)
+
+            entry = self.cache.get(name)
+            if not force and entry and not entry['stale']:
+                # Another process refreshed it already, just pass the news on
+                delay = entry['ttl'] - entry['age']
+                if entry['fetched_at'] != job.get('seen'):
+                    job['seen'] = entry['fetched_at']
+                    self._notify(name)
+                return
+
+            if not self.cache.claim(name, LEASE_SECONDS):
+                # Someone else is fetching it right now, look again shortly
+                delay = min(job['interval'], 10)
+                return
+
+            try:
+                with metrics.REFRESH_SECONDS.time(card=name):
+                    value = job['fetch']()
+                self.cache.set(name, value, interval)
+            finally:
+                self.cache.release(name)
+
+            job['seen'] = self.cache.get(name)['fetched_at']
+            if self.snapshots is not None:
+                self.snapshots.save(name, value, job['seen'])
+            self._notify(name)
+        except Exception as e:
+            metrics.REFRESH_ERRORS.inc(card=name)
+            metrics.error("Refresh", e, name)
+            delay = min(job['interval'], RETRY_DELAY)
+        finally:
+            job['next_run'] = time.monotonic() + max(delay, 1)
+            with self._lock:
+                self._in_flight.discard(name)
+                rerun = name in self._rerun
+                self._rerun.discard(name)
+            if rerun:
+                self.refresh(name, force=True)
+
+    def restore(self):
+        """
+        Fills in every card the cache has nothing for from its snapshot. The
+        snapshot keeps its own fetched_at, so it shows as stale and the card
+        is refreshed first thing.
+        """
+        if self.snapshots is None:
+            return
+
+        for name, (value, fetched_at) in self.snapshots.load_all().items():
+            if name in self.jobs and self.cache.get(name) is None:
+                self.cache.set(name, value, self.jobs[name]['interval'], fetched_at)
+
+    def start(self):
+        """
+        Restores the snapshots and starts the background loop that keeps every card warm.
+        """
+        if self._thread is None:
+            self.restore()
+            self._thread = threading.Thread(target=self._loop, name="card-scheduler", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            now = time.monotonic()
+            for name, job in self.jobs.items():
+                if job['next_run'] <= now:
+                    self.refresh(name)
+
+            # Scheduled cards keep their last good data however old it gets, an upstream can be down for days
+            self.cache.evict(keep=self.jobs)
+
+            # Sleep until the next card is due (but check in at least every minute)
+            next_due = min((job['next_run'] for job in self.jobs.values()), default=now + 60)
+            time.sleep(min(max(next_due - time.monotonic(), 1), 60))
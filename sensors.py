@@ -0,0 +1,326 @@
+import glob
+import math
+import os
+import random
+import threading
+import time
+
+from sysmon import RingBuffer
+import metrics
+
+# IIO channel types we know how to show, with the unit after scale is applied
+# and the factor that turns it into that unit (IIO reports milli units for these)
+IIO_CHANNELS = {
+    'temp': ("°C", 0.001),
+    'illuminance': ("lux", 1),
+    'humidityrelative': ("%", 0.001),
+    'pressure': ("kPa", 1),
+    'voltage': ("mV", 1),
+    'concentration': ("ppm", 1),
+}
+
+
+class Sensor:
+    """
+    One reading source. warning / critical are (low, high) ranges, a value
+    outside the range gets that status (either end can be None).
+    Raw readings go into a ring buffer, and every `bucket` readings are folded
+    into min / mean / max ring buffers so long history stays small. The
+    card's min / mean / max cover that whole long history.
+    """
+    def __init__(self, name, unit, warning=None, critical=None, history=120, bucket=12, buckets=240):
+        self.name = name
+        self.unit = unit
+        self.warning = warning
+        self.critical = critical
+        self.bucket = bucket
+        self.raw = RingBuffer(history)
+        self.mins = RingBuffer(buckets)
+        self.means = RingBuffer(buckets)
+        self.maxes = RingBuffer(buckets)
+        self._pending = []
+        self.updated_at = None
+
+    def record(self, value):
+        self.raw.append(value)
+        self.updated_at = time.time()
+
+        self._pending.append(value)
+        if len(self._pending) == self.bucket:
+            self.mins.append(min(self._pending))
+            self.means.append(sum(self._pending) / len(self._pending))
+            self.maxes.append(max(self._pending))
+            self._pending = []
+
+    def status(self, value):
+        for status, bounds in (('critical', self.critical), ('warning', self.warning)):
+            if bounds is None:
+                continue
+            low, high = bounds
+            if (low is not None and value < low) or (high is not None and value > high):
+                return status
+        return 'normal'
+
+    def extremes(self):
+        """
+        (min, mean, max) over every bucket plus the readings not folded in yet.
+        """
+        pending = self._pending
+        count = self.means.count * self.bucket + len(pending)
+        if not count:
+            return None
+        # Every full bucket holds the same number of readings, so their means weigh the same
+        mean = (sum(self.means.values()) * self.bucket + sum(pending)) / count
+        return min(self.mins.values() + pending), mean, max(self.maxes.values() + pending)
+
+    def summary(self):
+        value = self.raw.latest()
+        if value is None:
+            return None
+
+        low, mean, high = self.extremes()
+        return {'name': self.name,
+                'value': f"{value:.1f}" if value % 1 else f"{value:.0f}",
+                'unit': self.unit,
+                'status': self.status(value),
+                'min': low,
+                'mean': mean,
+                'max': high,
+                'updated_at': self.updated_at}
+
+
+class SensorDriver:
+    """
+    Base driver: discover() returns the Sensors it provides (keyed by an id
+    of the driver's choosing) and read() returns {id: value} for one sample.
+    Every driver is sampled in its own thread every `interval` seconds.
+    """
+    name = "driver"
+
+    def __init__(self, interval=10):
+        self.interval = interval
+
+    def available(self):
+        return True
+
+    def discover(self):
+        return {}
+
+    def read(self):
+        return {}
+
+
+def _read_number(path):
+    with open(path) as f:
+        return float(f.read().strip())
+
+
+class ThermalZoneDriver(SensorDriver):
+    """
+    Linux thermal zones (/sys/class/thermal/thermal_zone*/temp, millidegrees C).
+    """
+    name = "thermal"
+
+    def __init__(self, root="/sys/class/thermal", interval=10, warning=(None, 70), critical=(None, 85)):
+        super().__init__(interval)
+        self.root = root
+        self.warning = warning
+        self.critical = critical
+        self._zones = {}
+
+    def available(self):
+        return bool(glob.glob(os.path.join(self.root, "thermal_zone*")))
+
+    def discover(self):
+        sensors = {}
+        for zone in sorted(glob.glob(os.path.join(self.root, "thermal_zone*"))):
+            try:
+                with open(os.path.join(zone, "type")) as f:
+                    label = f.read().strip()
+            except OSError:
+                label = os.path.basename(zone)
+            key = os.path.basename(zone)
+            self._zones[key] = os.path.join(zone, "temp")
+            sensors[key] = Sensor(label, "°C", self.warning, self.critical)
+        return sensors
+
+    def read(self):
+        readings = {}
+        for key, path in self._zones.items():
+            try:
+                readings[key] = _read_number(path) / 1000
+            except (OSError, ValueError):
+                # Some zones refuse reads while their device is suspended
+                pass
+        return readings
+
+
+class IIODriver(SensorDriver):
+    """
+    Industrial I/O sensors (/sys/bus/iio/devices/iio:device*). Reads
+    in_<type>_input when the kernel gives a processed value, otherwise
+    (in_<type>_raw + offset) * scale. thresholds maps a channel type to
+    (warning, critical) ranges.
+    """
+    name = "iio"
+
+    def __init__(self, root="/sys/bus/iio/devices", interval=5, thresholds=None):
+        super().__init__(interval)
+        self.root = root
+        self.thresholds = thresholds or {}
+        self._channels = {}
+
+    def available(self):
+        return bool(glob.glob(os.path.join(self.root, "iio:device*")))
+
+    def discover(self):
+        sensors = {}
+        for device in sorted(glob.glob(os.path.join(self.root, "iio:device*"))):
+            try:
+                with open(os.path.join(device, "name")) as f:
+                    device_name = f.read().strip()
+            except OSError:
+                device_name = os.path.basename(device)
+
+            for path in sorted(glob.glob(os.path.join(device, "in_*_input")) + glob.glob(os.path.join(device, "in_*_raw"))):
+                channel = os.path.basename(path)[3:].rsplit("_", 1)[0]
+                kind = next((k for k in IIO_CHANNELS if channel.startswith(k)), None)
+                key = f"{os.path.basename(device)}:{channel}"
+                if kind is None or key in self._channels:
+                    continue
+
+                scale = offset = None
+                if path.endswith("_raw"):
+                    scale = self._optional(device, channel, "scale", 1)
+                    offset = self._optional(device, channel, "offset", 0)
+                unit, factor = IIO_CHANNELS[kind]
+                self._channels[key] = (path, scale, offset, factor)
+                warning, critical = self.thresholds.get(kind, (None, None))
+                sensors[key] = Sensor(f"{device_name} {channel}", unit, warning, critical)
+        return sensors
+
+    def _optional(self, device, channel, attribute, default):
+        # Scale / offset can be per channel or shared by every channel of that type
+        kind = channel.rstrip("0123456789").rstrip("_")
+        for name in (f"in_{channel}_{attribute}", f"in_{kind}_{attribute}"):
+            try:
+                return _read_number(os.path.join(device, name))
+            except (OSError, ValueError):
+                continue
+        return default
+
+    def read(self):
+        readings = {}
+        for key, (path, scale, offset, factor) in self._channels.items():
+            try:
+                value = _read_number(path)
+            except (OSError, ValueError):
+                continue
+            if scale is not None:
+                value = (value + offset) * scale
+            readings[key] = value * factor
+        return readings
+
+
+class SimulatedDriver(SensorDriver):
+    """
+    Random walks around fixed values, for developing the card without hardware.
+    """
+    name = "simulated"
+
+    SENSORS = {
+        'light': ("Light Level", "lux", 450, 40, None, None),
+        'soil': ("Soil Moisture", "%", 82, 5, (40, None), (20, None)),
+        'co2': ("CO2", "ppm", 412, 30, (None, 1000), (None, 2000)),
+        'rack': ("Rack Temp", "°C", 34, 2, (None, 33), (None, 40)),
+    }
+
+    def __init__(self, interval=5):
+        super().__init__(interval)
+        self._values = {}
+
+    def discover(self):
+        sensors = {}
+        for key, (name, unit, center, spread, warning, critical) in self.SENSORS.items():
+            self._values[key] = center
+            sensors[key] = Sensor(name, unit, warning, critical)
+        return sensors
+
+    def read(self):
+        for key, (name, unit, center, spread, warning, critical) in self.SENSORS.items():
+            # Drift a little each step and get pulled back towards the center
+            value = self._values[key] + random.gauss(0, spread / 4) + (center - self._values[key]) * 0.1
+            self._values[key] = round(max(value, 0), 1)
+        return dict(self._values)
+
+
+DRIVERS = {
+    'thermal': ThermalZoneDriver,
+    'iio': IIODriver,
+    'simulated': SimulatedDriver,
+}
+
+
+def load_drivers(names=None):
+    """
+    Builds drivers from SENSOR_DRIVERS (comma separated keys of DRIVERS). With
+    nothing set, every file backed driver that finds something under /sys is
+    used, or the simulated one if none do.
+    """
+    if names:
+        return [DRIVERS[name.strip()]() for name in names.split(",") if name.strip() in DRIVERS]
+
+    drivers = [driver for driver in (ThermalZoneDriver(), IIODriver()) if driver.available()]
+    return drivers or [SimulatedDriver()]
+
+
+class SensorHub:
+    """
+    Runs every driver on its own sampling thread and keeps each Sensor's
+    history. latest() only reads what the threads already stored, so the
+    card never does I/O. .version goes up after every sample.
+    """
+    def __init__(self, drivers):
+        self.drivers = drivers
+        self.sensors = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _sample(self, driver, sensors):
+        readings = driver.read()
+        with self._lock:
+            for key, value in readings.items():
+                if key in sensors and math.isfinite(value):
+                    sensors[key].record(value)
+            self.version += 1
+
+    def latest(self):
+        with self._lock:
+            summaries = [sensor.summary() for sensor in self.sensors.values()]
+        return [summary for summary in summaries if summary]
+
+    def start(self):
+        if self._threads:
+            return
+
+        for driver in self.drivers:
+            try:
+                sensors = driver.discover()
+            except Exception as e:
+                metrics.error("Sensor Driver", e, driver.name)
+                continue
+            with self._lock:
+                self.sensors.update({(driver.name, key): sensor for key, sensor in sensors.items()})
+
+            thread = threading.Thread(target=self._loop, args=(driver, sensors), name=f"sensors-{driver.name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _loop(self, driver, sensors):
+        while True:
+            try:
+                self._sample(driver, sensors)
+            except Exception as e:
+                metrics.error("Sensor Driver", e, driver.name)
+            time.sleep(driver.interval)
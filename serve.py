@@ -0,0 +1,26 @@
+"""
+Production entry point: python serve.py
+
+Serves the dashboard with waitress, a pool of threads in one process (works
+on Windows too). For several worker processes on Linux use gunicorn instead:
+gunicorn -c gunicorn.conf.py app:app
+
+Both keep the card cache in SQLite (CARD_CACHE_PATH, default card_cache.db),
+so extra threads or workers share one copy of every card's data and a card
+is only fetched from its API once no matter how many workers there are.
+"""
+import os
+from os import getenv
+
+os.environ.setdefault("CARD_CACHE_PATH", "card_cache.db")
+
+from waitress import serve
+
+import app
+
+if __name__ == '__main__':
+    app.start_background()
+    serve(app.app,
+          host=getenv("HOST") or "127.0.0.1",
+          port=int(getenv("PORT") or 8080),
+          threads=int(getenv("THREADS") or 16))
@@ -0,0 +1,91 @@
+import os
+import pickle
+import threading
+import time
+
+from database import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, fetched_at REAL, ttl REAL);
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, expires REAL);
+"""
+
+
+class SharedCardCache:
+    """
+    CardCache that lives in a SQLite file so every worker process sees the same
+    card data. Values are pickled, and each process keeps the last value it
+    unpickled so a read is one small indexed query unless the data changed.
+    Leases let only one process at a time refresh a card (see claim()).
+    """
+    def __init__(self, path="card_cache.db", max_entries=64, max_age=86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._local = {}
+        self._lock = threading.Lock()
+        self._db = Database(path, SCHEMA)
+
+    @property
+    def owner(self):
+        # Looked up every time so a cache made before a fork still tells the workers apart
+        return str(os.getpid())
+
+    def get(self, key):
+        with self._db.connect() as db:
+            row = db.execute("SELECT fetched_at, ttl FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            fetched_at, ttl = row
+
+            with self._lock:
+                local = self._local.get(key)
+            if local is None or local[0] != fetched_at:
+                blob = db.execute("SELECT value FROM cache WHERE key = ? AND fetched_at = ?", (key, fetched_at)).fetchone()
+                if blob is None:
+                    # Replaced between the two queries, the next read picks up the new one
+                    return None
+                local = (fetched_at, pickle.loads(blob[0]))
+                with self._lock:
+                    self._local[key] = local
+
+        age = time.time() - fetched_at
+        return {'value': local[1],
+                'fetched_at': fetched_at,
+                'ttl': ttl,
+                'age': age,
+                'stale': age >= ttl}
+
+    def set(self, key, value, ttl, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        blob = pickle.dumps(value)
+        with self._db.connect() as db:
+            db.execute("INSERT OR REPLACE INTO cache (key, value, fetched_at, ttl) VALUES (?, ?, ?, ?)",
+                       (key, blob, fetched_at, ttl))
+        with self._lock:
+            self._local[key] = (fetched_at, value)
+
+    def evict(self, keep=()):
+        keep = list(keep)
+        with self._db.connect() as db:
+            db.execute(f"DELETE FROM cache WHERE fetched_at < ? AND key NOT IN ({', '.join('?' * len(keep))})",
+                       [time.time() - self.max_age] + keep)
+            db.execute("DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY fetched_at DESC LIMIT ?)",
+                       (self.max_entries,))
+
+    def claim(self, name, seconds):
+        """
+        Takes the lease on name for this process unless another live process
+        holds it. Returns True if we got it.
+        """
+        now = time.time()
+        with self._db.connect() as db:
+            cursor = db.execute("""INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?)
+                                   ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+                                   WHERE leases.expires < ? OR leases.owner = excluded.owner""",
+                                (name, self.owner, now + seconds, now))
+            return cursor.rowcount == 1
+
+    def release(self, name):
+        with self._db.connect() as db:
+            db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
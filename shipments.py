@@ -0,0 +1,169 @@
+import hashlib
+import hmac
+import json
+import time
+
+from http_client import http
+import helper
+import metrics
+from database import Database
+
+TRACK17_API_URL = "https://api.17track.net/track/v2"
+
+# 17TRACK accepts at most 40 numbers per register / gettrackinfo / stoptrack call
+BATCH_SIZE = 40
+
+# Rejection code 17TRACK uses for a number that is already registered
+ALREADY_REGISTERED = -18019901
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    number TEXT PRIMARY KEY,
+    carrier INTEGER,
+    track_info TEXT,
+    registered INTEGER DEFAULT 0,
+    delivered_at REAL,
+    archived INTEGER DEFAULT 0,
+    updated_at REAL,
+    polled_at REAL DEFAULT 0
+);
+"""
+
+
+class ShipmentStore:
+    """
+    Local record of every package we track and its latest 17TRACK info.
+    New numbers are registered in batches, updates arrive through the webhook
+    (or a slow poll for anything the webhook hasn't touched in poll_interval),
+    and delivered packages are archived and stop being tracked after
+    archive_after seconds, so they never cost another API call.
+    """
+    def __init__(self, token, path="shipments.db", poll_interval=43200, archive_after=3 * 86400):
+        self.token = token
+        self.path = path
+        self.poll_interval = poll_interval
+        self.archive_after = archive_after
+        self._db = Database(path, SCHEMA)
+
+    def _post(self, endpoint, numbers):
+        headers = {
+            "17token": self.token,
+            "Content-Type": "application/json"
+        }
+        # Polls only read, so one made at the same time as an identical one can share its answer
+        response = http.post('17track', f"{TRACK17_API_URL}/{endpoint}", headers=headers,
+                             json=[{"number": n} for n in numbers], coalesce=endpoint == "gettrackinfo")
+        response.raise_for_status()
+        return response.json().get("data", {})
+
+    def register(self, numbers):
+        """
+        Registers numbers we haven't seen before with 17TRACK.
+        """
+        with self._db.connect() as db:
+            known = {row[0] for row in db.execute("SELECT number FROM packages WHERE registered = 1 OR archived = 1")}
+        new = [n for n in dict.fromkeys(numbers) if n and n not in known]
+
+        for chunk in helper.chunks(new, BATCH_SIZE):
+            data = self._post("register", chunk)
+            accepted = [(p['number'], p.get('carrier')) for p in data.get("accepted", [])]
+            accepted += [(p['number'], None) for p in data.get("rejected", [])
+                         if p.get('error', {}).get('code') == ALREADY_REGISTERED]
+            for p in data.get("rejected", []):
+                if p.get('error', {}).get('code') != ALREADY_REGISTERED:
+                    metrics.error("Shipping Register", p.get('error'), p.get('number'))
+
+            with self._db.connect() as db:
+                db.executemany("""INSERT INTO packages (number, carrier, registered) VALUES (?, ?, 1)
+                                  ON CONFLICT (number) DO UPDATE SET registered = 1,
+                                  carrier = COALESCE(excluded.carrier, carrier)""", accepted)
+
+    def apply(self, number, track_info, carrier=None):
+        """
+        Stores the latest track_info for a package (from a poll or the webhook),
+        returns True if it changed. Info without a latest_status (17TRACK hasn't
+        heard from the carrier yet) keeps whatever the package had before.
+        """
+        now = time.time()
+        if not track_info.get('latest_status'):
+            with self._db.connect() as db:
+                db.execute("UPDATE packages SET polled_at = ? WHERE number = ?", (now, number))
+            return False
+
+        delivered = (track_info.get('latest_status') or {}).get('status') == 'Delivered'
+        with self._db.connect() as db:
+            db.execute("""INSERT INTO packages (number, carrier, track_info, registered, delivered_at, updated_at, polled_at)
+                          VALUES (?, ?, ?, 1, ?, ?, ?)
+                          ON CONFLICT (number) DO UPDATE SET
+                              carrier = COALESCE(excluded.carrier, carrier),
+                              track_info = excluded.track_info,
+                              registered = 1,
+                              delivered_at = CASE WHEN excluded.delivered_at IS NULL THEN NULL
+                                                  ELSE COALESCE(delivered_at, excluded.delivered_at) END,
+                              updated_at = excluded.updated_at,
+                              polled_at = excluded.polled_at""",
+                       (number, carrier, json.dumps(track_info), now if delivered else None, now, now))
+        return True
+
+    def poll(self):
+        """
+        Fetches track info for in transit packages the webhook hasn't updated recently.
+        """
+        with self._db.connect() as db:
+            due = [row[0] for row in db.execute("""SELECT number FROM packages
+                                                  WHERE registered = 1 AND archived = 0 AND delivered_at IS NULL AND polled_at < ?""",
+                                                (time.time() - self.poll_interval,))]
+
+        for chunk in helper.chunks(due, BATCH_SIZE):
+            for package in self._post("gettrackinfo", chunk).get("accepted", []):
+                self.apply(package['number'], package.get('track_info') or {}, package.get('carrier'))
+
+    def archive_delivered(self):
+        with self._db.connect() as db:
+            done = [row[0] for row in db.execute("SELECT number FROM packages WHERE archived = 0 AND delivered_at < ?",
+                                                 (time.time() - self.archive_after,))]
+
+        for chunk in helper.chunks(done, BATCH_SIZE):
+            # Stop tracking so delivered packages stop using quota, archive them even if that fails
+            try:
+                self._post("stoptrack", chunk)
+            except Exception as e:
+                metrics.error("Shipping Stoptrack", e)
+
+            with self._db.connect() as db:
+                db.executemany("UPDATE packages SET archived = 1 WHERE number = ?", [(n,) for n in chunk])
+
+    def sync(self, numbers=()):
+        self.register(list(numbers))
+        self.poll()
+        self.archive_delivered()
+
+    def verify_webhook(self, body, sign):
+        """
+        17TRACK signs pushes with sha256(body + "/" + api key).
+        """
+        expected = hashlib.sha256(body + b"/" + (self.token or "").encode()).hexdigest()
+        return hmac.compare_digest(expected, sign or "")
+
+    def apply_webhook(self, payload):
+        """
+        Applies a 17TRACK push, returns True if a package changed.
+        """
+        data = payload.get('data') or {}
+        if payload.get('event') != 'TRACKING_UPDATED' or not data.get('number'):
+            return False
+
+        return self.apply(data['number'], data.get('track_info') or {}, data.get('carrier'))
+
+    def active(self):
+        """
+        Packages still in transit (or recently delivered), newest activity first,
+        in the same shape 17TRACK returns them ({'number', 'carrier', 'track_info'}).
+        """
+        with self._db.connect() as db:
+            rows = db.execute("""SELECT number, carrier, track_info FROM packages
+                                 WHERE archived = 0 AND track_info IS NOT NULL
+                                 ORDER BY updated_at DESC""").fetchall()
+
+        return [{'number': number, 'carrier': carrier, 'track_info': json.loads(track_info)}
+                for number, carrier, track_info in rows]
@@ -0,0 +1,51 @@
+import pickle
+import sqlite3
+
+import metrics
+from database import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (name TEXT PRIMARY KEY, value BLOB, fetched_at REAL);
+"""
+
+
+class SnapshotStore:
+    """
+    The last good data of every scheduled card, kept in SQLite so it survives
+    a restart. The scheduler saves a card here after every successful fetch
+    and loads them all back on startup, so cards show their last known data
+    (marked stale) straight away instead of waiting on their APIs.
+    """
+    def __init__(self, path="snapshots.db"):
+        self.path = path
+        self._db = Database(path, SCHEMA)
+
+    def save(self, name, value, fetched_at):
+        # A snapshot that can't be written shouldn't cost the card its fresh data, so this never raises
+        try:
+            blob = pickle.dumps(value)
+            with self._db.connect() as db:
+                db.execute("INSERT OR REPLACE INTO snapshots (name, value, fetched_at) VALUES (?, ?, ?)",
+                           (name, blob, fetched_at))
+        except Exception as e:
+            metrics.error("Snapshot", e, name)
+
+    def load_all(self):
+        """
+        Every snapshot as {name: (value, fetched_at)}. Ones that no longer
+        unpickle (e.g. saved by an older version) are printed and skipped.
+        """
+        try:
+            with self._db.connect() as db:
+                rows = db.execute("SELECT name, value, fetched_at FROM snapshots").fetchall()
+        except sqlite3.Error as e:
+            metrics.error("Snapshot", e)
+            return {}
+
+        snapshots = {}
+        for name, blob, fetched_at in rows:
+            try:
+                snapshots[name] = (pickle.loads(blob), fetched_at)
+            except Exception as e:
+                metrics.error("Snapshot", e, name)
+        return snapshots
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import http
+import metrics
+
+# Missing files are downloaded side by side
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="static-cache")
+
+
+class StaticCache:
+    """
+    Keeps remote images (weather icons, Steam avatars) on disk under static/
+    so the browser loads them from the dashboard instead of someone's CDN.
+    Each file is downloaded once, through the `provider` http client key, and
+    evict() drops the least recently used files past max_files.
+    """
+    def __init__(self, directory, url_path, provider, extension, label, max_files=500):
+        self.directory = directory
+        self.url_path = url_path
+        self.provider = provider
+        self.extension = extension
+        self.label = label
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        # File name -> last time it was used, seeded from the file times on boot
+        self._used = {f[:-len(extension)]: os.path.getmtime(os.path.join(directory, f))
+                      for f in os.listdir(directory) if f.endswith(extension)}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}{self.extension}")
+
+    def _download(self, name, url):
+        response = http.get(self.provider, url)
+        response.raise_for_status()
+
+        # Write to a temp file first so a half downloaded file is never served
+        path = self._path(name)
+        with open(f"{path}.tmp", "wb") as cached_file:
+            cached_file.write(response.content)
+        os.replace(f"{path}.tmp", path)
+
+        with self._lock:
+            self._used[name] = time.time()
+
+    def fetch_missing(self, files):
+        """
+        Downloads every file in files ({name: remote url}) that isn't cached
+        yet (in parallel). Failures are printed and tried again next time.
+        """
+        with self._lock:
+            missing = {name: url for name, url in files.items() if name not in self._used}
+
+        for future in [_pool.submit(self._download, name, url) for name, url in missing.items()]:
+            try:
+                future.result()
+            except Exception as e:
+                metrics.error(self.label, e)
+
+    def url(self, name, fallback=None):
+        """
+        Local path for a cached file, or fallback if it isn't on disk.
+        """
+        with self._lock:
+            if name not in self._used:
+                return fallback
+            self._used[name] = time.time()
+
+        return f"{self.url_path}/{name}{self.extension}"
+
+    def evict(self, keep=()):
+        """
+        Deletes the least recently used files over max_files, never ones in keep.
+        """
+        with self._lock:
+            extra = len(self._used) - self.max_files
+            if extra <= 0:
+                return
+            oldest = sorted((name for name in self._used if name not in keep), key=self._used.get)[:extra]
+            for name in oldest:
+                del self._used[name]
+
+        for name in oldest:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
@@ -0,0 +1,138 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import http
+import helper
+import metrics
+
+STEAM_API_URL = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/"
+
+# GetPlayerSummaries takes at most 100 ids per call
+BATCH_SIZE = 100
+
+# Id chunks are fetched side by side
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="steam")
+
+
+def parse_ids(raw):
+    """
+    Splits STEAM_IDS (comma or whitespace separated) into a list without duplicates.
+    """
+    return list(dict.fromkeys(i for i in re.split(r"[\s,]+", raw or "") if i))
+
+
+def _presence(p):
+    # Everything the card shows, a player only counts as changed if one of these did
+    return (p.get('personaname'), p.get('personastate', 0), p.get('gameextrainfo'), p.get('avatarhash'))
+
+
+def build_friend(p, avatar):
+    # 0=Offline, 1=Online, 2=Busy, 3=Away, etc.
+    status_code = p.get('personastate', 0)
+    game_name = p.get('gameextrainfo', None)
+
+    # Logic: If playing a game, show that. Else show status.
+    if game_name:
+        status_text = game_name
+        status_color = "#a3e635" # Lime Green for gaming
+        priority = 2
+    elif status_code == 1:
+        status_text = "Online"
+        status_color = "#60a5fa" # Blue for online
+        priority = 1
+    else:
+        status_text = "Offline"
+        status_color = "#94a3b8" # Grey
+        priority = 0
+
+    return {
+        'name': p['personaname'],
+        'avatar': avatar,
+        'status': status_text,
+        'color': status_color,
+        'priority': priority
+    }
+
+
+class SteamPresence:
+    """
+    Polls GetPlayerSummaries for every tracked id, 100 ids per call with the
+    calls made in parallel, and keeps the friends list between polls. Only
+    players whose presence changed are rebuilt, and the list is only sorted
+    again when something did change.
+    """
+    def __init__(self, api_key, steam_ids, avatars):
+        self.api_key = api_key
+        self.steam_ids = steam_ids
+        self.avatars = avatars
+        self._presence = {}
+        self._friends = {}
+        self._sorted = []
+        # Players still showing a remote avatar because the download failed
+        self._remote = set()
+
+    def _fetch(self, chunk):
+        params = {"key": self.api_key, "steamids": ",".join(chunk)}
+        return http.get_json('steam', STEAM_API_URL, params=params)['response']['players']
+
+    def poll(self):
+        """
+        Fetches every chunk and diffs the results into the friends list.
+        A failed chunk keeps its players as they were, if every chunk fails the
+        error is raised so the scheduler keeps the last good card.
+        Returns True if the list changed.
+        """
+        chunks = helper.chunks(self.steam_ids, BATCH_SIZE)
+        futures = [_pool.submit(self._fetch, chunk) for chunk in chunks]
+
+        changed = []
+        gone = []
+        errors = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                players = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+
+            returned = set()
+            for p in players:
+                steam_id = p['steamid']
+                returned.add(steam_id)
+                presence = _presence(p)
+                if self._presence.get(steam_id) != presence or steam_id in self._remote:
+                    self._presence[steam_id] = presence
+                    changed.append(p)
+
+            # Ids the API stopped returning (deleted or bad ids) drop off the card
+            gone += [steam_id for steam_id in chunk if steam_id not in returned and steam_id in self._friends]
+
+        if errors and len(errors) == len(chunks):
+            raise errors[0]
+        for e in errors:
+            metrics.error("Steam Chunk", e)
+
+        if changed:
+            self.avatars.fetch_missing({p['avatarhash']: p['avatar'] for p in changed if p.get('avatarhash')})
+        for p in changed:
+            avatar = self.avatars.url(p.get('avatarhash'), p.get('avatar'))
+            self._friends[p['steamid']] = build_friend(p, avatar)
+            if avatar == p.get('avatar'):
+                self._remote.add(p['steamid'])
+            else:
+                self._remote.discard(p['steamid'])
+        for steam_id in gone:
+            del self._friends[steam_id]
+            del self._presence[steam_id]
+            self._remote.discard(steam_id)
+
+        if not changed and not gone:
+            return False
+
+        # Sort by In Game, Online, Offline and Alphabetical if tie
+        self._sorted = sorted(self._friends.values(), key=lambda friend: (-friend['priority'], friend['name'].lower()))
+        self.avatars.evict(keep={presence[3] for presence in self._presence.values()})
+        return True
+
+    def friends(self):
+        return self._sorted
@@ -0,0 +1,184 @@
+import socket
+import threading
+import time
+from array import array
+
+import psutil
+import metrics
+
+# How often the disk list is re-read, in samples (mounts rarely change)
+DISK_REFRESH = 60
+
+
+class RingBuffer:
+    """
+    Fixed size history of floats in a preallocated array, the oldest value is
+    overwritten once it's full so memory never grows.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._data = array('d', bytes(8 * size))
+        self._next = 0
+        self.count = 0
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def latest(self):
+        return self._data[self._next - 1] if self.count else None
+
+    def values(self):
+        """
+        The buffered values, oldest first.
+        """
+        if self.count < self.size:
+            return self._data[:self.count].tolist()
+        return (self._data[self._next:] + self._data[:self._next]).tolist()
+
+
+def _ip_address():
+    # First IPv4 address on an interface that is up, whatever the interface is called
+    stats = psutil.net_if_stats()
+    for name, addrs in psutil.net_if_addrs().items():
+        if name in stats and not stats[name].isup:
+            continue
+        for addr in addrs:
+            if addr.family == socket.AF_INET and not addr.address.startswith("127."):
+                return addr.address
+    return "No Network"
+
+
+class SystemSampler:
+    """
+    Samples CPU, memory, every mounted disk, per interface throughput and
+    temperatures every `interval` seconds in its own thread. Each series keeps
+    its last `history` values in a RingBuffer, and the newest sample is kept
+    whole on .latest so the system card renders without touching psutil.
+    .version goes up after every sample.
+    """
+    def __init__(self, interval=5, history=120):
+        self.interval = interval
+        self.history = history
+        self.series = {}
+        self.latest = None
+        self.version = 0
+        self._disks = []
+        self._counters = None
+        self._samples = 0
+        self._thread = None
+
+    def _record(self, key, value):
+        buffer = self.series.get(key)
+        if buffer is None:
+            buffer = self.series[key] = RingBuffer(self.history)
+        buffer.append(value)
+
+    def history_of(self, key):
+        buffer = self.series.get(key)
+        return buffer.values() if buffer else []
+
+    def _read_disks(self):
+        disks = []
+        seen = set()
+        for part in psutil.disk_partitions():
+            if part.device in seen:
+                continue
+            seen.add(part.device)
+            try:
+                usage = psutil.disk_usage(part.mountpoint)
+            except OSError:
+                # Empty card readers / CD drives on Windows
+                continue
+            disks.append({'device': part.device, 'mountpoint': part.mountpoint, 'percent': usage.percent})
+        return disks
+
+    def _read_network(self, now):
+        counters = psutil.net_io_counters(pernic=True)
+        stats = psutil.net_if_stats()
+        previous, self._counters = self._counters, (now, counters)
+        if previous is None:
+            return []
+
+        elapsed = now - previous[0]
+        interfaces = []
+        for name, io in counters.items():
+            before = previous[1].get(name)
+            if before is None or name.startswith("lo") or (name in stats and not stats[name].isup):
+                continue
+            # Counters can reset when an interface comes back up
+            interfaces.append({'name': name,
+                               'sent': max(io.bytes_sent - before.bytes_sent, 0) / elapsed,
+                               'recv': max(io.bytes_recv - before.bytes_recv, 0) / elapsed})
+        return interfaces
+
+    def _read_temperatures(self):
+        # Not available on Windows / macOS, and empty on most VMs
+        if not hasattr(psutil, "sensors_temperatures"):
+            return []
+        try:
+            found = psutil.sensors_temperatures()
+        except Exception:
+            return []
+
+        temps = []
+        for chip, entries in found.items():
+            for i, entry in enumerate(entries):
+                temps.append({'name': f"{chip} {entry.label or i}", 'current': entry.current})
+        return temps
+
+    def sample(self):
+        now = time.time()
+        if self._samples % DISK_REFRESH == 0:
+            self._disks = self._read_disks()
+        else:
+            for disk in self._disks:
+                try:
+                    disk['percent'] = psutil.disk_usage(disk['mountpoint']).percent
+                except OSError:
+                    pass
+        self._samples += 1
+
+        # Non blocking, measures since the previous call
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        interfaces = self._read_network(now)
+        temps = self._read_temperatures()
+
+        self._record('cpu', cpu)
+        self._record('memory', memory.percent)
+        for disk in self._disks:
+            self._record(f"disk:{disk['mountpoint']}", disk['percent'])
+        for nic in interfaces:
+            self._record(f"sent:{nic['name']}", nic['sent'])
+            self._record(f"recv:{nic['name']}", nic['recv'])
+        for temp in temps:
+            self._record(f"temp:{temp['name']}", temp['current'])
+
+        # Swapped in whole so readers never see half a sample
+        self.latest = {'cpu': cpu,
+                       'memory': memory,
+                       'disks': [dict(disk) for disk in self._disks],
+                       'interfaces': interfaces,
+                       'temperatures': temps,
+                       'ipaddr': _ip_address(),
+                       'sampled_at': now}
+        self.version += 1
+        return self.latest
+
+    def start(self):
+        if self._thread is None:
+            # Primes cpu_percent and the interface counters so the first real sample has something to compare to
+            psutil.cpu_percent(interval=None)
+            self._read_network(time.time())
+            self._thread = threading.Thread(target=self._loop, name="system-sampler", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                metrics.error("System Sampler", e)
@@ -0,0 +1,199 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import date
+
+import helper
+from database import Database
+
+# Define color map for statuses
+STATUS_COLORS = {
+    "Done": "var(--success)",              # Green
+    "Working on it": "var(--warning)",     # Amber/Orange
+    "Stuck": "var(--danger)",              # Red
+    "Not Started": "var(--text-muted)"     # Grey
+}
+
+# Webhook events that take an item off the board
+REMOVE_EVENTS = {"delete_pulse", "archive_pulse", "move_pulse_from_board"}
+
+# fetch_items_by_id takes at most this many ids per call
+MAX_IDS_PER_FETCH = 100
+
+# Webhook changes, in the order they arrived, for every worker's store to catch up on
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id TEXT,
+    removed INTEGER,
+    received_at REAL
+);
+"""
+
+
+def build_task(item):
+    task = {
+        'id': str(item.id),
+        'name': item.name,
+        'due_date': None,
+        'timeline': None,
+        'status': 'Ready',
+        'status_color': 'var(--text-muted)',
+        'priority': ''
+    }
+
+    for column in item.column_values:
+
+        title = column.column.title
+        text = column.text
+
+        match (title):
+            case 'Status':
+                task['status'] = text if text else 'Ready'
+                # Map the text to a color, default to grey
+                task['status_color'] = STATUS_COLORS.get(text, "var(--text-muted)")
+
+            case 'Due date':
+                task['due_date'] = text
+
+            case 'Priority':
+                task['priority'] = text
+
+            case _:
+                task[title] = text
+
+    return task
+
+
+class TaskStore:
+    """
+    Local copy of a Monday board's tasks, always kept in display order.
+    After one full fetch it only asks Monday for items updated since the last
+    sync, plus any items a webhook told us about. A full fetch still runs every
+    full_sync_interval to pick up deletions that happened without a webhook.
+    Webhook changes go into a SQLite log rather than this store, since under
+    several workers the one that got the webhook may not be the one that
+    syncs next. Each store reads the log from where it left off.
+    """
+    def __init__(self, client, board_id, path="tasks.db", full_sync_interval=86400):
+        self.client = client
+        self.board_id = board_id
+        self.full_sync_interval = full_sync_interval
+        self.tasks = {}
+        self.last_updated_at = None
+        self.last_full_sync = 0
+        self._order = []
+        self._seen = 0
+        self._lock = threading.Lock()
+        self._db = Database(path, SCHEMA)
+
+    def _sort_key(self, task):
+        return helper.task_sort_key(task) + (task['id'],)
+
+    def _upsert(self, task):
+        with self._lock:
+            self._remove(task['id'])
+            self.tasks[task['id']] = task
+            insort(self._order, (self._sort_key(task), task['id']))
+
+    def _remove(self, item_id):
+        old = self.tasks.pop(item_id, None)
+        if old is not None:
+            index = bisect_left(self._order, (self._sort_key(old), item_id))
+            del self._order[index]
+
+    def remove(self, item_id):
+        with self._lock:
+            self._remove(str(item_id))
+
+    def _track_updated_at(self, item):
+        if item.updated_at and (self.last_updated_at is None or item.updated_at > self.last_updated_at):
+            self.last_updated_at = item.updated_at
+
+    def _apply_items(self, items):
+        for item in items:
+            if item.state in ("archived", "deleted"):
+                self.remove(item.id)
+            else:
+                self._upsert(build_task(item))
+            self._track_updated_at(item)
+
+    def _replace_all(self, items):
+        # Build the new board off to the side and swap it in, so the card never sees it half loaded
+        tasks = {}
+        for item in items:
+            if item.state not in ("archived", "deleted"):
+                task = build_task(item)
+                tasks[task['id']] = task
+            self._track_updated_at(item)
+
+        order = sorted((self._sort_key(task), item_id) for item_id, task in tasks.items())
+        with self._lock:
+            self.tasks = tasks
+            self._order = order
+
+    def sync(self):
+        """
+        Brings the store up to date, doing a full board fetch only when needed.
+        """
+        with self._db.connect() as db:
+            changes = db.execute("SELECT seq, item_id, removed FROM task_changes WHERE seq > ? ORDER BY seq",
+                                 (self._seen,)).fetchall()
+            seen = changes[-1][0] if changes else self._seen
+            # Anything older than a full sync is covered by one, whichever store it was left for
+            db.execute("DELETE FROM task_changes WHERE received_at < ?", (time.time() - self.full_sync_interval,))
+
+        if self.last_updated_at is None or time.time() - self.last_full_sync > self.full_sync_interval:
+            self._replace_all(self.client.boards.fetch_all_items_by_board_id(board_id=self.board_id))
+            self.last_full_sync = time.time()
+            # The full board already has every change read above
+            changes = []
+        else:
+            items = self.client.boards.fetch_item_by_board_id_by_update_date(board_id=self.board_id,
+                                                                             updated_after=self.last_updated_at,
+                                                                             updated_before=None)
+            self._apply_items(items)
+
+        dirty = []
+        for seq, item_id, removed in changes:
+            if removed:
+                self.remove(item_id)
+            else:
+                dirty.append(item_id)
+        dirty = list(dict.fromkeys(dirty))
+
+        for i in range(0, len(dirty), MAX_IDS_PER_FETCH):
+            self._apply_items(self.client.items.fetch_items_by_id(dirty[i:i + MAX_IDS_PER_FETCH]))
+        self._seen = seen
+
+    def apply_webhook(self, event):
+        """
+        Logs a Monday webhook event for the next sync, in whichever worker
+        that runs: removals take the item off, other changes have it fetched.
+        Returns True if the next sync has something new.
+        """
+        item_id = event.get('pulseId')
+        if item_id is None or str(event.get('boardId')) != str(self.board_id):
+            return False
+
+        with self._db.connect() as db:
+            db.execute("INSERT INTO task_changes (item_id, removed, received_at) VALUES (?, ?, ?)",
+                       (str(item_id), event.get('type') in REMOVE_EVENTS, time.time()))
+        return True
+
+    def sorted_tasks(self):
+        """
+        Returns the tasks ready for the card, in order, with overdue ones flagged.
+        """
+        today_str = date.today().strftime("%Y-%m-%d")
+        with self._lock:
+            ordered = [self.tasks[item_id] for _, item_id in self._order]
+
+        tasks = []
+        for task in ordered:
+            if task['due_date'] and task['due_date'] < today_str and task['status'] != 'Done':
+                # Override the color to Red if overdue and prefix the name so you see it instantly
+                task = dict(task, status_color='var(--danger)', name=f"! {task['name']}")
+            tasks.append(task)
+
+        return tasks
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from http_client import http
+from static_cache import StaticCache
+
+ICON_URL = "https://openweathermap.org/img/wn/{name}.png"
+
+# Current conditions, the forecast and any missing icons are all fetched side by side
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="weather")
+
+
+class IconCache(StaticCache):
+    """
+    OpenWeather icons, downloaded once the first time a forecast uses them.
+    """
+    def __init__(self, directory, url_path):
+        super().__init__(directory, url_path, 'openweather-icons', ".png", "Weather Icon")
+
+    def fetch_missing(self, names):
+        super().fetch_missing({name: ICON_URL.format(name=name) for name in names})
+
+    def img(self, name):
+        url = self.url(name)
+        if url is None:
+            # Could make a local error photo instead
+            return "Not Found"
+
+        return f"<img src={url}>"
+
+
+def group_forecast_by_day(forecast_hours, icons):
+    """
+    Groups the 3 hour forecast list into days in one pass, formatting each
+    entry's time and icon and tracking each day's high and low on the way.
+    """
+    forecast_days = []
+    prev_day = None
+    for hour in forecast_hours:
+        dt = datetime.fromtimestamp(hour['dt'])
+        temp = hour['main']['temp']
+
+        hour['icon_PNG'] = icons.img(hour['weather'][0]['icon'])
+        hour['formatted_time'] = f"{dt.hour % 12 or 12} {'AM' if dt.hour < 12 else 'PM'}"
+
+        if dt.date() != prev_day:
+            forecast_days.append({"day": f"{dt:%A, %B} {dt.day}, {dt.year}",
+                                  "high": temp,
+                                  "low": temp,
+                                  "hour_data": []})
+            prev_day = dt.date()
+
+        day = forecast_days[-1]
+        day["hour_data"].append(hour)
+        day["high"] = max(day["high"], temp)
+        day["low"] = min(day["low"], temp)
+
+    return forecast_days
+
+
+def fetch_weather(current_url, forecast_url, icons):
+    """
+    Fetches current conditions and the forecast concurrently and returns the
+    weather card's template data.
+    """
+    current_future = _pool.submit(http.get_json, 'openweather', current_url)
+    forecast_future = _pool.submit(http.get_json, 'openweather', forecast_url)
+    current_weather = current_future.result()
+    forecast_weather = forecast_future.result()
+
+    current_icon = f"{current_weather['weather'][0]['icon']}@2x"
+    icons.fetch_missing({current_icon} | {hour['weather'][0]['icon'] for hour in forecast_weather['list']})
+
+    return {'weather_icon': icons.img(current_icon),
+            'current_temp': current_weather['main']['temp'],
+            'condition_text': current_weather['weather'][0]['description'].title(),
+            'temp_high': round(current_weather['main']['temp_max']),
+            'temp_low': round(current_weather['main']['temp_min']),
+            'forecast_days': group_forecast_by_day(forecast_weather['list'], icons)}